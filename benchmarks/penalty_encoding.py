@@ -0,0 +1,59 @@
+'''
+Compare the "pairwise" and "window" encodings of the spacing and leader-gap penalties.
+
+    python -m benchmarks.penalty_encoding --people 20 40 80 --time-limit 10
+
+For every roster size and encoding, prints model size, build time, solve time, the
+objective reached and the best bound.
+'''
+import argparse
+import time
+
+import pandas as pd
+from ortools.sat.python.cp_model import CpSolver, OPTIMAL
+
+from benchmarks.roster_generator import synthetic_roster
+from scripts.scheduling_logic import ScheduleBuilder
+
+
+def run(people, seeds, time_limit):
+    results = []
+    for num_people in people:
+        for encoding in ["pairwise", "window"]:
+            for seed in range(seeds):
+                data = synthetic_roster(num_people, seed=seed, leader_ratio=7 / num_people)
+
+                start = time.perf_counter()
+                builder = ScheduleBuilder(data, n=1)
+                builder.build_model(sparse=True, penalty_encoding=encoding)
+                build_time = time.perf_counter() - start
+
+                solver = CpSolver()
+                solver.parameters.max_time_in_seconds = time_limit
+                status = solver.Solve(builder.model)
+
+                results.append({
+                    "people": num_people,
+                    "encoding": encoding,
+                    "seed": seed,
+                    **builder.model_size(),
+                    "build_s": round(build_time, 3),
+                    "solve_s": round(solver.WallTime(), 2),
+                    "optimal": status == OPTIMAL,
+                    "objective": solver.ObjectiveValue(),
+                    "bound": solver.BestObjectiveBound(),
+                })
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--people", type=int, nargs="+", default=[20, 40, 80])
+    parser.add_argument("--seeds", type=int, default=2)
+    parser.add_argument("--time-limit", type=float, default=10)
+    args = parser.parse_args()
+
+    results = run(args.people, args.seeds, args.time_limit)
+    print(results.to_string(index=False))
+    print()
+    print(results.groupby(["people", "encoding"])[["variables", "constraints", "build_s", "solve_s", "objective"]].mean())
@@ -0,0 +1,120 @@
+'''
+Re-solve a corpus of model snapshots (scripts/snapshot.py) with other solver parameters or
+penalty encodings, to catch solver performance regressions on real quarters.
+
+    python -m benchmarks.replay snapshots/ --encodings snapshot window --params params.json --time-limit 60
+
+Every .npz file in the inputs is solved once per encoding and parameter set:
+    --encodings   "snapshot" solves the saved model as is, "pairwise"/"window" rebuild it
+                  from the snapshot's roster with that penalty encoding
+    --params      JSON file of named CP-SAT parameter sets, e.g.
+                  {"default": {}, "8 workers": {"num_workers": 8}, "lns": {"use_lns_only": true}}
+                  Every set starts from the snapshot's solve profile (workers, gap) and the
+                  --time-limit; the default is a single set "saved".
+and records:
+    status, objective, bound, gap   what the solve reached (gap relative to the objective)
+    first_s                         time to the first solution
+    best_s                          time to the last improving solution
+    optimal_s                       time to prove optimality (empty unless OPTIMAL)
+    solve_s, conflicts, branches    CP-SAT effort
+'''
+import argparse
+import itertools
+import json
+import os
+import sys
+
+import pandas as pd
+from ortools.sat.python.cp_model import OPTIMAL, CpSolver, CpSolverSolutionCallback
+
+from scripts.profiling import status_names
+from scripts.snapshot import load_snapshot
+
+
+class TimingCallback(CpSolverSolutionCallback):
+    def __init__(self):
+        super().__init__()
+        self.first = None
+        self.best = None
+
+    def on_solution_callback(self):
+        if self.first is None:
+            self.first = self.wall_time
+        self.best = self.wall_time
+
+
+def find_snapshots(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths += sorted(os.path.join(item, f) for f in os.listdir(item) if f.endswith(".npz"))
+        else:
+            paths.append(item)
+    return paths
+
+
+def replay(snapshot, encoding, params, time_limit):
+    model = snapshot.model() if encoding == "snapshot" else snapshot.builder(penalty_encoding=encoding).search_model
+
+    settings = snapshot.meta["solve_settings"]
+    solver = CpSolver()
+    solver.parameters.num_workers = settings.get("workers", 0)
+    solver.parameters.relative_gap_limit = settings.get("relative_gap", 0.0)
+    if time_limit:
+        solver.parameters.max_time_in_seconds = time_limit
+    for name, value in params.items():
+        setattr(solver.parameters, name, value)
+
+    callback = TimingCallback()
+    status = solver.Solve(model, callback)
+    found = callback.first is not None and model.has_objective()
+    objective = solver.ObjectiveValue() if found else None
+    bound = solver.BestObjectiveBound() if found else None
+    return {
+        "status": status_names.get(status, str(status)),
+        "objective": objective,
+        "bound": bound,
+        "gap": round(abs(objective - bound) / max(1.0, abs(objective)), 4) if found else None,
+        "first_s": round(callback.first, 3) if callback.first is not None else None,
+        "best_s": round(callback.best, 3) if callback.best is not None else None,
+        "optimal_s": round(solver.WallTime(), 3) if status == OPTIMAL else None,
+        "solve_s": round(solver.WallTime(), 3),
+        "conflicts": solver.NumConflicts(),
+        "branches": solver.NumBranches(),
+    }
+
+
+def run(paths, encodings, param_sets, time_limit):
+    rows = []
+    for path in paths:
+        snapshot = load_snapshot(path)
+        for encoding, (name, params) in itertools.product(encodings, param_sets.items()):
+            result = {"snapshot": os.path.basename(path), "encoding": encoding, "params": name,
+                      **replay(snapshot, encoding, params, time_limit)}
+            print("  ".join(f"{k}={v}" for k, v in result.items()), file=sys.stderr)
+            rows.append(result)
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="snapshot .npz files or directories of them")
+    parser.add_argument("--encodings", nargs="+", choices=["snapshot", "pairwise", "window"], default=["snapshot"])
+    parser.add_argument("--params", help="JSON file of named CP-SAT parameter sets")
+    parser.add_argument("--time-limit", type=float, default=60)
+    parser.add_argument("--output", help="write the results to this .csv file")
+    args = parser.parse_args()
+
+    param_sets = {"saved": {}}
+    if args.params:
+        with open(args.params) as f:
+            param_sets = json.load(f)
+
+    paths = find_snapshots(args.inputs)
+    if not paths:
+        sys.exit("no snapshots found")
+
+    results = run(paths, args.encodings, param_sets, args.time_limit)
+    if args.output:
+        results.to_csv(args.output, index=False)
+    print(results.drop(columns=["conflicts", "branches"]).to_string(index=False))
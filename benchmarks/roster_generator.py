@@ -0,0 +1,85 @@
+'''
+Seeded synthetic rosters shaped like the team_availability table.
+
+    synthetic_roster(80, horizon=20, density=0.6, leader_ratio=0.15, seed=3)
+
+Every knob the scheduler is sensitive to can be set: number of people, horizon length,
+how likely each instrument is to be played, how many weeks people are free, the share
+of leaders, the distribution of requested frequencies (num_weeks) and how many distinct
+profiles there are. The same arguments and seed always give the same DataFrame.
+'''
+import numpy as np
+import pandas as pd
+
+from scripts.utils import instruments
+
+# roughly how often each instrument shows up in real responses
+default_instrument_mix = {
+    "electric_guitar": 0.10,
+    "acoustic_guitar": 0.25,
+    "vocals": 0.55,
+    "piano": 0.20,
+    "cajon": 0.10,
+    "strings": 0.10,
+}
+
+# probability of asking for 1, 2, 3 or 4 weeks per quarter
+default_num_weeks_dist = {1: 0.25, 2: 0.35, 3: 0.25, 4: 0.15}
+
+
+'''
+Build a roster of `num_people` rows with week columns w1..w{horizon}.
+
+instrument_mix: {instrument: probability a person plays it}, missing instruments never
+    played. Everyone plays at least one instrument.
+density: probability a person is free in any given week (everyone is free at least once).
+leader_ratio: share of people marked is_leader. Leaders always sing and play acoustic
+    guitar or piano, like the real leaders do.
+num_weeks_dist: {num_weeks: probability}.
+profiles: if set, only this many distinct people are drawn (with leader_ratio applying to
+    them) and everyone is a copy of one of them under their own name, like respondents
+    with identical answers.
+'''
+def synthetic_roster(num_people, horizon=10, seed=0, density=0.7, leader_ratio=0.15,
+                     instrument_mix=None, num_weeks_dist=None, profiles=None) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    mix = default_instrument_mix if instrument_mix is None else instrument_mix
+    dist = default_num_weeks_dist if num_weeks_dist is None else num_weeks_dist
+    total, num_people = num_people, profiles or num_people
+
+    play_prob = np.array([mix.get(i, 0.0) for i in instruments])
+    plays = rng.random((num_people, len(instruments))) < play_prob
+    # anyone who ended up with no instrument gets one, drawn in proportion to the mix
+    nothing = np.flatnonzero(~plays.any(axis=1))
+    if len(nothing) and play_prob.sum() > 0:
+        plays[nothing, rng.choice(len(instruments), size=len(nothing), p=play_prob / play_prob.sum())] = True
+
+    available = rng.random((num_people, horizon)) < density
+    free_never = np.flatnonzero(~available.any(axis=1))
+    available[free_never, rng.integers(0, horizon, size=len(free_never))] = True
+
+    num_weeks = rng.choice(list(dist), size=num_people, p=np.array(list(dist.values())) / sum(dist.values()))
+
+    is_leader = np.zeros(num_people, dtype=bool)
+    num_leaders = int(round(leader_ratio * num_people))
+    is_leader[rng.choice(num_people, size=num_leaders, replace=False)] = True
+    col = {i: j for j, i in enumerate(instruments)}
+    plays[is_leader, col["vocals"]] = True
+    guitar = rng.random(num_people) < 0.5
+    plays[is_leader & guitar, col["acoustic_guitar"]] = True
+    plays[is_leader & ~guitar, col["piano"]] = True
+
+    if profiles:
+        pick = rng.integers(0, profiles, size=total)
+        plays, available, num_weeks, is_leader = plays[pick], available[pick], num_weeks[pick], is_leader[pick]
+        num_people = total
+
+    data = pd.DataFrame({
+        "name": [f"person{k}" for k in range(num_people)],
+        "email": [f"person{k}@example.com" for k in range(num_people)],
+        "phone": [f"555-{k:04d}" for k in range(num_people)],
+        "num_weeks": num_weeks.astype(int),
+    })
+    weeks = pd.DataFrame(available, columns=[f"w{w}" for w in range(1, horizon + 1)])
+    caps = pd.DataFrame(plays, columns=instruments)
+    return pd.concat([data, weeks, caps, pd.Series(is_leader, name="is_leader")], axis=1)
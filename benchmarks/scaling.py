@@ -0,0 +1,190 @@
+'''
+Measure how ScheduleBuilder scales across a grid of synthetic rosters.
+
+    python -m benchmarks.scaling --people 40 60 --horizon 10 20 --output bench.json
+    python -m benchmarks.scaling --output new.json --baseline bench.json
+
+Every grid point (people x horizon x density x leader ratio x seed) runs in a fresh
+process and records:
+    build_s, solve_s, extract_s       model build, CP-SAT solve, read_solution
+    variables, constraints            model size
+    build_peak_mb, extract_peak_mb    peak Python allocations in that phase (tracemalloc)
+    peak_rss_mb                       peak resident memory of the process, solver included
+    status, objective, bound          what the solve reached within --time-limit
+
+Results are written as JSON (with the run settings and library versions) or CSV,
+depending on the --output suffix. With --baseline, build/extract time, model size and
+memory are compared to an earlier JSON run and the command exits with status 1 if any
+grid point got more than --tolerance times worse.
+'''
+import argparse
+import itertools
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import ortools
+import pandas as pd
+from ortools.sat.python.cp_model import CpSolver, FEASIBLE, INFEASIBLE, OPTIMAL
+
+from benchmarks.roster_generator import synthetic_roster
+from scripts.scheduling_logic import ScheduleBuilder
+
+grid_keys = ["people", "horizon", "density", "leader_ratio", "seed"]
+# metrics that should not grow between runs of the same grid point
+regression_metrics = ["build_s", "extract_s", "variables", "constraints", "build_peak_mb", "peak_rss_mb"]
+
+status_names = {OPTIMAL: "OPTIMAL", FEASIBLE: "FEASIBLE", INFEASIBLE: "INFEASIBLE"}
+
+
+# run fn() twice: once timed, once under tracemalloc (which slows Python down) for its
+# peak allocations. Returns (result of the timed run, seconds, peak MB)
+def measure(fn):
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / 2**20
+
+
+def run_point(point, time_limit, workers, sparse, encoding):
+    data = synthetic_roster(
+        point["people"], horizon=point["horizon"], seed=point["seed"],
+        density=point["density"], leader_ratio=point["leader_ratio"],
+    )
+
+    def build():
+        builder = ScheduleBuilder(data, n=1)
+        builder.build_model(sparse=sparse, penalty_encoding=encoding)
+        return builder
+
+    builder, build_s, build_peak = measure(build)
+    issues = builder.check_feasibility()
+
+    builder.solver = CpSolver()
+    builder.solver.parameters.max_time_in_seconds = time_limit
+    if workers:
+        builder.solver.parameters.num_workers = workers
+    status = builder.solver.Solve(builder.model)
+
+    extract_s = extract_peak = None
+    if status in (OPTIMAL, FEASIBLE):
+        _, extract_s, extract_peak = measure(builder.read_solution)
+
+    return {
+        **point,
+        **builder.model_size(),
+        "precheck_issues": len(issues),
+        "status": status_names.get(status, "UNKNOWN"),
+        "objective": builder.solver.ObjectiveValue() if status in (OPTIMAL, FEASIBLE) else None,
+        "bound": builder.solver.BestObjectiveBound() if status in (OPTIMAL, FEASIBLE) else None,
+        "build_s": round(build_s, 4),
+        "solve_s": round(builder.solver.WallTime(), 3),
+        "extract_s": round(extract_s, 5) if extract_s is not None else None,
+        "build_peak_mb": round(build_peak, 2),
+        "extract_peak_mb": round(extract_peak, 3) if extract_peak is not None else None,
+        # ru_maxrss is in KB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def run(grid, time_limit=10, workers=1, sparse=True, encoding="pairwise"):
+    points = [dict(zip(grid_keys, values)) for values in itertools.product(*(grid[k] for k in grid_keys))]
+
+    # one process per point, so peak memory isn't carried over from a bigger roster
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context, max_tasks_per_child=1) as pool:
+        for point in points:
+            result = pool.submit(run_point, point, time_limit, workers, sparse, encoding).result()
+            print(
+                "  ".join(f"{k}={result[k]}" for k in grid_keys + ["status", "build_s", "solve_s", "extract_s", "peak_rss_mb"]),
+                file=sys.stderr,
+            )
+            results.append(result)
+    return pd.DataFrame(results)
+
+
+def save(results, path, settings):
+    if path.endswith(".csv"):
+        results.to_csv(path, index=False)
+        return
+    payload = {
+        "settings": settings,
+        "environment": {
+            "python": platform.python_version(),
+            "ortools": ortools.__version__,
+            "machine": platform.machine(),
+            "cpus": multiprocessing.cpu_count(),
+        },
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": json.loads(results.to_json(orient="records")),
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+
+
+'''
+Grid points where a metric grew by more than `tolerance` times compared to `baseline`.
+Tiny absolute values (under a millisecond or a megabyte) are ignored as noise.
+'''
+def compare(results, baseline, tolerance=1.25):
+    merged = results.merge(baseline, on=grid_keys, suffixes=("", "_baseline"))
+    floors = {"build_s": 1e-3, "extract_s": 1e-3, "build_peak_mb": 1, "peak_rss_mb": 1}
+    rows = []
+    for metric in regression_metrics:
+        new, old = merged[metric], merged[f"{metric}_baseline"]
+        worse = (new > old * tolerance) & (new - old > floors.get(metric, 0))
+        for _, row in merged[worse.fillna(False)].iterrows():
+            rows.append({**{k: row[k] for k in grid_keys}, "metric": metric, "baseline": row[f"{metric}_baseline"], "now": row[metric]})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--people", type=int, nargs="+", default=[40, 60])
+    parser.add_argument("--horizon", type=int, nargs="+", default=[10, 20])
+    parser.add_argument("--density", type=float, nargs="+", default=[0.5, 0.7])
+    parser.add_argument("--leader-ratio", type=float, nargs="+", default=[0.15])
+    parser.add_argument("--seeds", type=int, default=1)
+    parser.add_argument("--time-limit", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=1, help="CP-SAT workers, 0 for the solver default")
+    parser.add_argument("--dense", action="store_true", help="build the dense model instead of the sparse one")
+    parser.add_argument("--encoding", choices=["pairwise", "window"], default="pairwise")
+    parser.add_argument("--output", help="write results to this .json or .csv file")
+    parser.add_argument("--baseline", help="earlier .json results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=1.25)
+    args = parser.parse_args()
+
+    grid = {
+        "people": args.people,
+        "horizon": args.horizon,
+        "density": args.density,
+        "leader_ratio": args.leader_ratio,
+        "seed": list(range(args.seeds)),
+    }
+    settings = {"grid": grid, "time_limit": args.time_limit, "workers": args.workers, "sparse": not args.dense, "encoding": args.encoding}
+
+    results = run(grid, args.time_limit, args.workers, not args.dense, args.encoding)
+    print(results.to_string(index=False))
+    if args.output:
+        save(results, args.output, settings)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = pd.DataFrame(json.load(f)["results"])
+        regressions = compare(results, baseline, args.tolerance)
+        if len(regressions):
+            print("\nRegressions:")
+            print(regressions.to_string(index=False))
+            sys.exit(1)
+        print("\nNo regressions against", args.baseline)
@@ -0,0 +1,103 @@
+'''
+Time to prove a schedule optimal, with and without symmetry breaking.
+
+    python -m benchmarks.symmetry --people 16 24 --profiles 6 8 --seeds 4 --time-limit 60
+
+Rosters come from synthetic_roster with only --profiles distinct people, so many
+respondents are interchangeable. Every roster is solved twice to optimality (or the time
+limit), on the plain model and with build_model(symmetry_breaking=True), and records:
+    classes, constraints_added     groups of interchangeable people, ordering constraints
+    status, objective, bound       what each solve reached
+    solve_s, conflicts, branches   CP-SAT effort
+Both runs proving optimality must agree on the objective; a mismatch is reported and the
+command exits with status 1.
+'''
+import argparse
+import itertools
+import sys
+
+import pandas as pd
+
+from benchmarks.roster_generator import synthetic_roster
+from scripts.scheduling_logic import ScheduleBuilder
+
+
+def run_roster(data, symmetry_breaking, time_limit, workers):
+    builder = ScheduleBuilder(data, n=1)
+    builder.build_model(sparse=True, symmetry_breaking=symmetry_breaking)
+    builder.set_solve_profile(workers=workers, time_limit=time_limit)
+    builder.get_solutions(1)
+    solve = builder.profile.solves[-1]
+    return {
+        "classes": len(builder.symmetry_classes()),
+        "constraints_added": builder.profile.families.get("symmetry breaking", {}).get("constraints", 0),
+        "status": solve["status"],
+        "objective": solve["objective"],
+        "bound": solve["best_bound"],
+        "solve_s": round(solve["wall_time"], 3),
+        "conflicts": solve["conflicts"],
+        "branches": solve["branches"],
+    }
+
+
+def run(people, profiles, horizon, seeds, density, leader_ratio, time_limit, workers):
+    rows = []
+    for num_people, num_profiles, seed in itertools.product(people, profiles, range(seeds)):
+        data = synthetic_roster(num_people, horizon=horizon, seed=seed, density=density,
+                                leader_ratio=leader_ratio, profiles=num_profiles)
+        point = {"people": num_people, "profiles": num_profiles, "seed": seed}
+        issues = ScheduleBuilder(data, n=1).check_feasibility()
+        if issues:
+            print(f"skipping {point}: {issues[0]}", file=sys.stderr)
+            continue
+
+        for symmetry_breaking in (False, True):
+            result = {**point, "symmetry_breaking": symmetry_breaking, **run_roster(data, symmetry_breaking, time_limit, workers)}
+            print("  ".join(f"{k}={v}" for k, v in result.items()), file=sys.stderr)
+            rows.append(result)
+    return pd.DataFrame(rows)
+
+
+# one row per roster: proof time with and without, and whether the optima agree
+def summarize(results):
+    keys = ["people", "profiles", "seed"]
+    plain = results[~results["symmetry_breaking"]].set_index(keys)
+    broken = results[results["symmetry_breaking"]].set_index(keys)
+    summary = pd.DataFrame({
+        "classes": broken["classes"],
+        "plain_status": plain["status"],
+        "plain_s": plain["solve_s"],
+        "broken_status": broken["status"],
+        "broken_s": broken["solve_s"],
+        "speedup": (plain["solve_s"] / broken["solve_s"]).round(2),
+    })
+    both_optimal = (plain["status"] == "OPTIMAL") & (broken["status"] == "OPTIMAL")
+    summary["mismatch"] = both_optimal & (plain["objective"] != broken["objective"])
+    return summary.reset_index()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--people", type=int, nargs="+", default=[16, 24])
+    parser.add_argument("--profiles", type=int, nargs="+", default=[6, 8])
+    parser.add_argument("--horizon", type=int, default=6)
+    parser.add_argument("--seeds", type=int, default=4)
+    parser.add_argument("--density", type=float, default=0.9)
+    parser.add_argument("--leader-ratio", type=float, default=0.25)
+    parser.add_argument("--time-limit", type=float, default=60)
+    parser.add_argument("--workers", type=int, default=1, help="CP-SAT workers, 0 for the solver default")
+    parser.add_argument("--output", help="write the per-solve results to this .csv file")
+    args = parser.parse_args()
+
+    results = run(args.people, args.profiles, args.horizon, args.seeds, args.density,
+                  args.leader_ratio, args.time_limit, args.workers)
+    if results.empty:
+        sys.exit("no feasible rosters in the grid")
+    if args.output:
+        results.to_csv(args.output, index=False)
+
+    summary = summarize(results)
+    print(summary.to_string(index=False))
+    if summary["mismatch"].any():
+        print("\nSymmetry breaking changed the optimal objective")
+        sys.exit(1)
@@ -1,16 +1,96 @@
+import threading
+import time
+from types import SimpleNamespace
+
 import streamlit as st
 
+# refresh the access token in the background once it is this close (seconds) to expiring
+refresh_margin = 120
+# how long a verified user is trusted when the session doesn't say when it expires
+default_auth_ttl = 3600
+
+
+'''
+The verified user of one browser session, kept in st.session_state so reruns don't ask
+Supabase who is logged in. Valid until the access token expires; near the end the token
+is refreshed on a background thread, which extends the expiry.
+The admin check is remembered together with the admin set it was made against, so it is
+only redone when that set is reloaded.
+'''
+class AuthCache:
+    def __init__(self, user, expires_at):
+        self.user = user
+        self.expires_at = expires_at
+        self.admins = None
+        self.is_admin = False
+        self.refresher = None
+        self.lock = threading.Lock()
+
+    def valid(self):
+        return time.time() < self.expires_at
+
+    def authorize(self, allowed_admins):
+        if self.admins is not allowed_admins:
+            self.admins = allowed_admins
+            self.is_admin = self.user.email in allowed_admins
+        return self.is_admin
+
+    def refresh_if_due(self, conn):
+        if time.time() < self.expires_at - refresh_margin:
+            return
+        with self.lock:
+            if self.refresher is None or not self.refresher.is_alive():
+                self.refresher = threading.Thread(target=self._refresh, args=(conn,), daemon=True)
+                self.refresher.start()
+
+    def _refresh(self, conn):
+        try:
+            res = conn.client.auth.refresh_session()
+        except Exception:
+            # leave it to expire, the next rerun after that verifies the user again
+            return
+        if res and res.session:
+            self.expires_at = session_expiry(res.session)
+            self.user = res.user or self.user
+
+
+def session_expiry(session):
+    expires_at = getattr(session, "expires_at", None) if session else None
+    return expires_at or time.time() + default_auth_ttl
+
+
+def clear_auth_cache():
+    st.session_state.pop("auth_cache", None)
+
+
 def logout(conn):
-    conn.client.auth.sign_out()
+    if conn is not None:
+        conn.client.auth.sign_out()
+    clear_auth_cache()
     st.session_state.authenticated = False
     st.rerun()
 
 
+'''
+Return the logged in admin, or show the login page / access denied and stop.
+allowed_admins should be a set (Repository.admin_emails() keeps one cached).
+Without a Supabase connection (the offline SQLite backend) there is no login: the user is
+the LOCAL_ADMIN_EMAIL secret, which still has to be in the admins table.
+'''
 def check_auth(conn, allowed_admins):
+    if conn is None:
+        user = SimpleNamespace(email=st.secrets.get("LOCAL_ADMIN_EMAIL", "admin@localhost"))
+        if user.email not in allowed_admins:
+            st.error(f"Access Denied: {user.email} is not an authorized admin.")
+            st.stop()
+        st.session_state.authenticated = True
+        return user
+
     # If 'code' is in the URL, we are returning from Google
     if "code" in st.query_params:
         try:
             auth_code = st.query_params["code"]
+            clear_auth_cache()
             conn.client.auth.exchange_code_for_session({"auth_code": auth_code})
             
             st.query_params.clear()
@@ -19,24 +99,30 @@ def check_auth(conn, allowed_admins):
             st.error(f"Handshake failed: {e}")
             st.stop()
 
-    # Check for user session
-    user = None
-    try:
-        user_res = conn.client.auth.get_user()
-        if user_res:
-            user = user_res.user
-    except:
-        pass
+    # Check for user session, asking Supabase only when there is no unexpired cached one
+    cache = st.session_state.get("auth_cache")
+    if cache is None or not cache.valid():
+        cache = None
+        try:
+            user_res = conn.client.auth.get_user()
+            if user_res and user_res.user:
+                cache = AuthCache(user_res.user, session_expiry(conn.client.auth.get_session()))
+        except:
+            pass
+        st.session_state.auth_cache = cache
 
     # Authorize user
-    if user:
-        if user.email in allowed_admins:
+    if cache:
+        cache.refresh_if_due(conn)
+        user = cache.user
+        if cache.authorize(allowed_admins):
             st.session_state.authenticated = True
             return user
         else:
             st.error(f"Access Denied: {user.email} is not an authorized admin.")
             if st.sidebar.button("Log Out"):
                 conn.client.auth.sign_out()
+                clear_auth_cache()
                 st.rerun()
             st.stop()
 
@@ -0,0 +1,244 @@
+'''
+Headless batch scheduling: solve many rosters from files, in parallel, with no UI or database.
+
+    python -m scripts.batch rosters/ spring.parquet --out results/ --jobs 4 --time-limit 120
+
+Every input is a CSV or Parquet file shaped like the team_availability table (a directory
+is expanded to the .csv/.parquet files in it). Each roster is solved in its own worker
+process, at most --jobs at a time, so a crash or a runaway solve only loses that roster.
+Horizons longer than two quarters are planned with the rolling-horizon solver, like the
+admin page does. --leader-first plans the leader rotation before the instruments, and
+--compare-joint adds the gap to the joint model's optimum to the summary.
+
+Per job limits:
+    --time-limit   solve budget in seconds; a worker still running --grace seconds after
+                   that is killed
+    --memory-mb    heap limit for the worker process; CP-SAT is asked to stop searching
+                   (and keep its best schedule) a little below it
+
+Output, per roster <name>:
+    <out>/<name>/schedule_<k>.csv      schedule k in the admin table layout
+    <out>/<name>/diagnostics_<k>.csv   per person diagnostics for schedule k
+    <out>/<name>/profile.json          phase timings and solver statistics
+and for the whole batch <out>/summary.json and <out>/summary.csv with one row per roster.
+With --snapshots DIR the built model of every roster is also saved as DIR/<name>.npz, for
+replaying later with benchmarks.replay (not for rolling horizons, which have no single model).
+'''
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from multiprocessing.connection import wait
+
+import pandas as pd
+from ortools.sat.python.cp_model import INFEASIBLE
+
+from scripts.scheduling_logic import ScheduleBuilder, solve_presets
+from scripts.snapshot import save_snapshot
+from scripts.utils import schedule_to_table, weeks_per_quarter
+
+SOLVED = "solved"
+INFEASIBLE_ROSTER = "infeasible"
+NO_SOLUTION = "no solution"
+TIMED_OUT = "timed out"
+OUT_OF_MEMORY = "out of memory"
+FAILED = "failed"
+
+roster_suffixes = (".csv", ".parquet")
+# solves whose objective is the one of the schedule returned
+final_solves = ("best schedule", "full horizon check", "instruments for fixed leaders", "joint fallback")
+
+
+def read_roster(path) -> pd.DataFrame:
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+# input files from a mix of files and directories, in a stable order
+def find_rosters(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths += sorted(os.path.join(item, f) for f in os.listdir(item) if f.endswith(roster_suffixes))
+        else:
+            paths.append(item)
+    return paths
+
+
+def output_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+'''
+Solve one roster file and write its schedules. Returns a summary dict for the batch report.
+'''
+def solve_roster(path, out_dir, options):
+    started = time.monotonic()
+    summary = {"roster": path, "status": FAILED, "schedules": 0, "objective": None, "issues": [], "error": None}
+    try:
+        data = read_roster(path)
+        builder = ScheduleBuilder(data, n=options["n"])
+        builder.set_solve_profile(**options["solve_profile"])
+        summary.update(people=len(builder.P), weeks=len(builder.T))
+
+        issues = builder.check_feasibility()
+        if issues:
+            summary.update(status=INFEASIBLE_ROSTER, issues=issues)
+            return summary
+
+        if len(builder.T) > 2 * weeks_per_quarter:
+            # builds one small model per window, nothing to build or snapshot up front
+            solutions = builder.solve_rolling(window=weeks_per_quarter, step=weeks_per_quarter // 2)
+        else:
+            builder.build_model(sparse=True, symmetry_breaking=True)
+            if options.get("snapshot_dir"):
+                save_snapshot(builder, os.path.join(options["snapshot_dir"], f"{output_name(path)}.npz"))
+            if options.get("leader_first"):
+                solutions = builder.solve_decomposed(compare_joint=options.get("compare_joint", False))
+                summary["decomposition"] = builder.decomposition
+            else:
+                solutions = builder.get_solution_pool(n=options["n"], min_distance=options["min_distance"], gap=options["gap"])
+
+        if not solutions:
+            if builder.status == INFEASIBLE:
+                summary.update(status=INFEASIBLE_ROSTER, issues=builder.explain_infeasibility() or ["The constraints conflict"])
+            else:
+                summary.update(status=NO_SOLUTION, issues=["No schedule found within the time limit"])
+        else:
+            objective = [s["objective"] for s in builder.profile.solves if s["solve"] in final_solves]
+            summary.update(status=SOLVED, schedules=len(solutions), objective=objective[-1] if objective else None)
+
+        roster_dir = os.path.join(out_dir, output_name(path))
+        os.makedirs(roster_dir, exist_ok=True)
+        for k, (solution, diagnostics) in enumerate(solutions, start=1):
+            schedule_to_table(solution).to_csv(os.path.join(roster_dir, f"schedule_{k}.csv"))
+            pd.DataFrame.from_dict(diagnostics, orient="index").to_csv(
+                os.path.join(roster_dir, f"diagnostics_{k}.csv"), index_label="name"
+            )
+        with open(os.path.join(roster_dir, "profile.json"), "w") as f:
+            json.dump(builder.profile.to_dict(), f, indent=2, default=str)
+    except MemoryError:
+        summary.update(status=OUT_OF_MEMORY)
+    except Exception as e:
+        summary.update(status=FAILED, error=repr(e))
+    finally:
+        summary["seconds"] = round(time.monotonic() - started, 2)
+    return summary
+
+
+# entry point of a worker process: cap the heap, solve, send the summary back
+def _worker(path, out_dir, options, conn):
+    if options.get("memory_mb"):
+        limit = options["memory_mb"] * 2**20
+        resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+    conn.send(solve_roster(path, out_dir, options))
+    conn.close()
+
+
+'''
+Solve every roster in `paths`, at most `jobs` worker processes at a time.
+Workers that outlive time_limit + grace are killed. Returns the list of summaries.
+'''
+def run_batch(paths, out_dir, options, jobs=1, grace=30, log=sys.stderr):
+    os.makedirs(out_dir, exist_ok=True)
+    context = multiprocessing.get_context("spawn")
+    time_limit = options["solve_profile"].get("time_limit")
+
+    pending = list(paths)
+    running = {}  # receiving end of the pipe -> (path, process, start time)
+    summaries = []
+
+    def finish(summary):
+        summaries.append(summary)
+        print(f"[{len(summaries)}/{len(paths)}] {summary['roster']}: {summary['status']} "
+              f"({summary['schedules']} schedules, {summary.get('seconds', 0):.1f}s)", file=log)
+
+    while pending or running:
+        while pending and len(running) < jobs:
+            path = pending.pop(0)
+            recv, send = context.Pipe(duplex=False)
+            process = context.Process(target=_worker, args=(path, out_dir, options, send), daemon=True)
+            process.start()
+            send.close()
+            running[recv] = (path, process, time.monotonic())
+
+        ready = wait(list(running) + [p.sentinel for _, p, _ in running.values()], timeout=1.0)
+        for recv, (path, process, started) in list(running.items()):
+            elapsed = time.monotonic() - started
+            if recv in ready or process.sentinel in ready:
+                try:
+                    summary = recv.recv()
+                except EOFError:
+                    # the worker died without reporting, e.g. killed by the memory limit
+                    process.join()
+                    status = OUT_OF_MEMORY if process.exitcode in (-6, -9) and options.get("memory_mb") else FAILED
+                    summary = {"roster": path, "status": status, "schedules": 0, "objective": None, "issues": [],
+                               "error": f"worker exited with code {process.exitcode}", "seconds": round(elapsed, 2)}
+                process.join()
+            elif time_limit and elapsed > time_limit + grace:
+                process.kill()
+                process.join()
+                summary = {"roster": path, "status": TIMED_OUT, "schedules": 0, "objective": None, "issues": [],
+                           "error": None, "seconds": round(elapsed, 2)}
+            else:
+                continue
+            recv.close()
+            del running[recv]
+            finish(summary)
+
+    with open(os.path.join(out_dir, "summary.json"), "w") as f:
+        json.dump(summaries, f, indent=2, default=str)
+    table = pd.DataFrame(summaries)
+    table["issues"] = table["issues"].map("; ".join)
+    table.to_csv(os.path.join(out_dir, "summary.csv"), index=False)
+    return summaries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="roster .csv/.parquet files or directories of them")
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--jobs", type=int, default=max(1, os.cpu_count() or 1), help="rosters solved at the same time")
+    parser.add_argument("--preset", choices=list(solve_presets), default="balanced")
+    parser.add_argument("--time-limit", type=float, help="solve budget per roster in seconds (default: from the preset)")
+    parser.add_argument("--workers", type=int, default=1, help="CP-SAT search workers per roster")
+    parser.add_argument("--memory-mb", type=int, help="memory limit per roster")
+    parser.add_argument("--grace", type=float, default=30, help="seconds past the time limit before a worker is killed")
+    parser.add_argument("-n", type=int, default=1, help="schedules per roster")
+    parser.add_argument("--min-distance", type=int, default=4)
+    parser.add_argument("--gap", type=float, default=0.05)
+    parser.add_argument("--leader-first", action="store_true", help="plan the leader rotation first, then the instruments (one schedule)")
+    parser.add_argument("--compare-joint", action="store_true", help="with --leader-first, also solve the joint model and report the gap")
+    parser.add_argument("--snapshots", help="directory to save every built model in, see scripts.snapshot")
+    parser.add_argument("--log-search", action="store_true", help="split solve times into presolve and search in profile.json")
+    args = parser.parse_args()
+
+    solve_profile = {**solve_presets[args.preset], "workers": args.workers, "log_search": args.log_search}
+    if args.time_limit:
+        solve_profile["time_limit"] = args.time_limit
+    if args.memory_mb:
+        # leave headroom for Python and the model itself
+        solve_profile["max_memory_mb"] = max(1, int(args.memory_mb * 0.8))
+
+    options = {
+        "n": args.n,
+        "min_distance": args.min_distance,
+        "gap": args.gap,
+        "solve_profile": solve_profile,
+        "memory_mb": args.memory_mb,
+        "leader_first": args.leader_first,
+        "compare_joint": args.compare_joint,
+        "snapshot_dir": args.snapshots,
+    }
+    paths = find_rosters(args.inputs)
+    if not paths:
+        sys.exit("no roster files found")
+    if args.snapshots:
+        os.makedirs(args.snapshots, exist_ok=True)
+
+    summaries = run_batch(paths, args.out, options, jobs=args.jobs, grace=args.grace)
+    print(pd.DataFrame(summaries)[["roster", "status", "schedules", "objective", "seconds"]].to_string(index=False))
@@ -0,0 +1,143 @@
+'''
+Content-addressed cache for built models and solution sets.
+
+Entries are keyed by a fingerprint of the roster columns the scheduler reads plus the
+solver parameters, so any change to a response produces a new key and old entries are
+simply never hit again. The in-memory tier is a bounded LRU; the optional on-disk tier
+pickles entries to a directory so they survive app restarts.
+'''
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from scripts.utils import instruments, week_columns
+
+# bump when the model or the cached value format changes, so old disk entries are ignored
+CACHE_VERSION = 1
+
+
+'''
+Hash the roster columns used by ScheduleBuilder (availability, instruments, num_weeks,
+is_leader) together with the solver parameters. Row order and unused columns such as
+email or phone do not affect the fingerprint.
+'''
+def roster_fingerprint(data: pd.DataFrame, params=None) -> str:
+    week_cols = [f"w{w}" for w in week_columns(data)]
+    bool_cols = week_cols + [i for i in instruments if i in data.columns]
+    if 'is_leader' in data.columns:
+        bool_cols.append('is_leader')
+
+    roster = data[['name'] + bool_cols + ['num_weeks']].copy()
+    roster[bool_cols] = roster[bool_cols].fillna(False).astype(bool)
+    roster['num_weeks'] = roster['num_weeks'].astype(int)
+    roster = roster.sort_values('name')
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps([CACHE_VERSION, list(roster.columns), params or {}], sort_keys=True, default=str).encode())
+    digest.update(roster.to_csv(index=False).encode())
+    return digest.hexdigest()
+
+
+class FingerprintCache:
+    def __init__(self, max_entries=16, cache_dir=None, max_disk_entries=256):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key):
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, value)
+        return value
+
+    '''
+    Store a value in memory, and on disk when persist is set and a cache_dir is configured
+    (built models hold solver objects and are kept in memory only).
+    '''
+    def put(self, key, value, persist=True):
+        with self._lock:
+            self._remember(key, value)
+        if persist and self.cache_dir:
+            self._write_disk(key, value)
+
+    # remove and return an in-memory entry (disk entries are left alone)
+    def pop(self, key):
+        with self._lock:
+            return self.entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+        if self.cache_dir:
+            for f in os.listdir(self.cache_dir):
+                if f.endswith(".pkl"):
+                    os.remove(os.path.join(self.cache_dir, f))
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self.entries:
+                return True
+        return bool(self.cache_dir) and os.path.exists(self._path(key))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _remember(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                value = pickle.load(f)
+            os.utime(self._path(key))
+            return value
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _write_disk(self, key, value):
+        # write to a temp file and rename, so a crash never leaves a half-written entry
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._path(key))
+
+        # drop the least recently written entries once the directory is full
+        files = [os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir) if f.endswith(".pkl")]
+        if len(files) > self.max_disk_entries:
+            files.sort(key=os.path.getmtime)
+            for f in files[:len(files) - self.max_disk_entries]:
+                try:
+                    os.remove(f)
+                except OSError:
+                    pass
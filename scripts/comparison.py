@@ -0,0 +1,98 @@
+'''
+Side by side comparison of the generated schedule options, in one vectorized pass over
+stacked arrays instead of one DataFrame per option:
+    x      (n x P x T x I) bool   option k assigns person P[p] to instrument I[j] in week T[t]
+    lead   (n x P x T) bool       option k has P[p] lead week T[t]
+
+SolutionComparison computes
+    distances   (n x n) cells (assignments and leaders) that differ between two options
+    agreement   (T x I+1) share of the options that make the most common choice for each cell
+                of the schedule table (instrument rows, then 'Leader'); 1.0 means the cell is
+                locked in across all options, anything lower is contested
+    load        (n x P) weeks each person is scheduled in each option, summarized per person
+                by load_spread()
+    penalties   (n x terms) objective terms per option, weighted like ScheduleBuilder's
+                objective (same values as ScheduleEvaluator.penalties)
+'''
+import numpy as np
+import pandas as pd
+
+from scripts.scheduling_logic import penalty_counts, weighted_penalties
+from scripts.solution_store import StoredSolutions, schedule_arrays
+
+
+'''
+(x, lead) for a list of (solution, diagnostics) or a StoredSolutions, in the builder's order
+'''
+def stack_solutions(builder, solutions):
+    if isinstance(solutions, StoredSolutions):
+        return solutions.stacked()
+    arrays = [schedule_arrays(builder, solution) for solution, _ in solutions]
+    return np.array([x for x, _ in arrays]), np.array([lead for _, lead in arrays])
+
+
+'''
+Share of the rows of `keys` (n x cells) holding each column's most common value: sorting
+every column puts equal values in runs, and the longest run is the most common value.
+O(n log n) per cell, nothing pairwise.
+'''
+def most_common_share(keys):
+    n, cells = keys.shape
+    ordered = np.sort(keys, axis=0).T  # cells x n
+    starts = np.ones(ordered.shape, dtype=bool)
+    starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    runs = np.cumsum(starts, axis=1) - 1  # run number of every value within its cell
+    lengths = np.bincount((np.arange(cells)[:, None] * n + runs).ravel(), minlength=cells * n)
+    return lengths.reshape(cells, n).max(axis=1) / n
+
+
+class SolutionComparison:
+    def __init__(self, builder, x, lead):
+        self.P, self.T, self.I = builder.P, builder.T, builder.I_all
+        self.rows = self.I + ['Leader']
+        n = len(x)
+
+        # every cell of the schedule table as one column per person: n x P x T x (I+1)
+        cells = np.concatenate([x, lead[..., None]], axis=3)
+
+        # Hamming distances from one matrix product: |a| + |b| - 2 a.b, over the cells that
+        # differ somewhere (most are empty in every option, which adds nothing)
+        flat = cells.reshape(n, -1)
+        flat = flat[:, flat.any(axis=0) & ~flat.all(axis=0)].astype(np.float32)
+        sizes = flat.sum(axis=1)
+        self.distances = np.rint(sizes[:, None] + sizes[None, :] - 2 * flat @ flat.T).astype(int)
+
+        # the people in a cell packed into one comparable value per (option, week, row)
+        packed = np.ascontiguousarray(np.packbits(cells, axis=1).transpose(0, 2, 3, 1))
+        keys = packed.view(np.dtype((np.void, packed.shape[3])))[..., 0]
+        self.agreement = most_common_share(keys.reshape(n, -1)).reshape(keys.shape[1:])
+
+        scheduled = x.any(axis=3)  # n x P x T
+        self.load = scheduled.sum(axis=2)
+        self.penalties = self.objective_terms(builder, x, lead)
+
+    def objective_terms(self, builder, x, lead):
+        terms = pd.DataFrame(weighted_penalties(penalty_counts(x, lead, builder.targets, builder.spacing, self.I)))
+        terms.index = [f"Option {k + 1}" for k in range(len(x))]
+        return terms
+
+    # cells of the schedule table (week, row) with the same people in every option
+    def locked_cells(self):
+        return {(self.T[t], self.rows[r]) for t, r in zip(*np.nonzero(self.agreement == 1.0))}
+
+    def distance_table(self):
+        labels = list(self.penalties.index)
+        return pd.DataFrame(self.distances, index=labels, columns=labels)
+
+    '''
+    Weeks scheduled per person across the options (mean, min, max, variance), people
+    whose load varies most first
+    '''
+    def load_spread(self):
+        spread = pd.DataFrame({
+            "mean weeks": self.load.mean(axis=0).round(2),
+            "min": self.load.min(axis=0),
+            "max": self.load.max(axis=0),
+            "variance": self.load.var(axis=0).round(3),
+        }, index=self.P)
+        return spread.sort_values("variance", ascending=False, kind="stable")
@@ -0,0 +1,223 @@
+'''
+Data access for the form and admin pages.
+
+A Repository sits in front of a storage backend and
+    - caches reads, shared by all sessions: the roster for `ttl` seconds, the admin list
+      (a set) for `admin_ttl` seconds
+    - drops a cached table whenever it writes to it
+    - writes leader changes as one bulk upsert instead of an update per person
+
+Backends implement select(table, columns, where) and upsert(table, rows, on_conflict):
+    SupabaseBackend   the hosted database, through the st_supabase_connection connection
+    SQLiteBackend     a local file (or :memory:) with the same tables, for running offline
+
+The pages pick the backend with the DATA_BACKEND secret ("supabase" or "sqlite",
+SQLITE_PATH for the file) through get_connection() and get_repository(). With "sqlite" no
+Supabase connection is made, so the app runs without Supabase secrets. Generated schedules are kept in the
+solution_sets and solutions tables of the same backend (see scripts.solution_store).
+'''
+import json
+import re
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+from scripts.utils import instruments, week_labels, weeks_per_quarter
+
+ROSTER_TABLE = "team_availability"
+ADMINS_TABLE = "admins"
+SOLUTION_SETS_TABLE = "solution_sets"
+SOLUTIONS_TABLE = "solutions"
+
+# week columns of the hosted roster table, w1..w10 (the form fills the labelled ones)
+ROSTER_WEEKS = sorted({f"w{k}" for k in range(1, weeks_per_quarter + 1)} | set(week_labels), key=lambda c: int(c[1:]))
+
+
+class SupabaseBackend:
+    def __init__(self, conn):
+        self.conn = conn
+
+    # where is {column: value}, rows must match all of them
+    def select(self, table, columns="*", where=None):
+        query = self.conn.table(table).select(columns)
+        for column, value in (where or {}).items():
+            query = query.eq(column, value)
+        response = query.execute()
+        return response.data if response else []
+
+    # rows is a list of dicts, sent as one request
+    def upsert(self, table, rows, on_conflict):
+        self.conn.table(table).upsert(rows, on_conflict=on_conflict).execute()
+
+
+class SQLiteBackend:
+    def __init__(self, path=":memory:"):
+        # Streamlit runs sessions on different threads, so share one connection behind a lock
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.create_tables()
+
+    def create_tables(self):
+        flags = [*ROSTER_WEEKS, *instruments, "is_leader"]
+        columns = ", ".join(f'"{c}" BOOLEAN DEFAULT 0' for c in flags)
+        with self.lock, self.db:
+            self.db.execute(
+                f'CREATE TABLE IF NOT EXISTS {ROSTER_TABLE} '
+                f'(email TEXT PRIMARY KEY, name TEXT, phone TEXT, num_weeks INTEGER, {columns})'
+            )
+            self.db.execute(f'CREATE TABLE IF NOT EXISTS {ADMINS_TABLE} (email TEXT PRIMARY KEY)')
+            self.db.execute(
+                f'CREATE TABLE IF NOT EXISTS {SOLUTION_SETS_TABLE} (id TEXT PRIMARY KEY, fingerprint TEXT, '
+                f'settings TEXT, people TEXT, weeks TEXT, instruments TEXT, count INTEGER, created_at REAL)'
+            )
+            self.db.execute(
+                f'CREATE TABLE IF NOT EXISTS {SOLUTIONS_TABLE} (id TEXT PRIMARY KEY, set_id TEXT, k INTEGER, x TEXT, leaders TEXT)'
+            )
+            self.db.execute(f'CREATE INDEX IF NOT EXISTS {SOLUTIONS_TABLE}_set ON {SOLUTIONS_TABLE} (set_id, k)')
+
+    def column_types(self, table):
+        return {row[1]: row[2] for row in self.db.execute(f'PRAGMA table_info("{table}")')}
+
+    def select(self, table, columns="*", where=None):
+        where = where or {}
+        condition = " AND ".join(f'"{c}" = ?' for c in where)
+        with self.lock:
+            cursor = self.db.execute(f'SELECT {columns} FROM "{table}"' + (f" WHERE {condition}" if where else ""), list(where.values()))
+            names = [d[0] for d in cursor.description]
+            rows = cursor.fetchall()
+            types = self.column_types(table)
+
+        # SQLite stores booleans as 0/1, hand them back as bools like Supabase does
+        flags = [k for k, name in enumerate(names) if types.get(name) == "BOOLEAN"]
+        result = []
+        for row in rows:
+            row = list(row)
+            for k in flags:
+                if row[k] is not None:
+                    row[k] = bool(row[k])
+            result.append(dict(zip(names, row)))
+        return result
+
+    def upsert(self, table, rows, on_conflict):
+        if not rows:
+            return
+        with self.lock, self.db:
+            # new week columns (a longer horizon) are added on first write
+            known = self.column_types(table)
+            for column in {c for row in rows for c in row} - set(known):
+                kind = "BOOLEAN DEFAULT 0" if re.fullmatch(r"w\d+", column) else ""
+                self.db.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {kind}')
+
+            for row in rows:
+                columns = list(row)
+                quoted = ", ".join(f'"{c}"' for c in columns)
+                updates = ", ".join(f'"{c}" = excluded."{c}"' for c in columns if c != on_conflict) or f'"{on_conflict}" = excluded."{on_conflict}"'
+                self.db.execute(
+                    f'INSERT INTO "{table}" ({quoted}) VALUES ({", ".join("?" * len(columns))}) '
+                    f'ON CONFLICT("{on_conflict}") DO UPDATE SET {updates}',
+                    [row[c] for c in columns],
+                )
+
+
+class Repository:
+    def __init__(self, backend, ttl=60, admin_ttl=600):
+        self.backend = backend
+        self.ttl = ttl
+        # the admin list rarely changes and is read on every rerun of the admin page
+        self.admin_ttl = admin_ttl
+        self.cache = {}  # key -> (expires at, value)
+        self.lock = threading.Lock()
+
+    def _cached(self, key, load, ttl=None):
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+        value = load()
+        with self.lock:
+            self.cache[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        return value
+
+    def invalidate(self, *keys):
+        with self.lock:
+            for key in keys or list(self.cache):
+                self.cache.pop(key, None)
+
+    '''
+    All form responses as a DataFrame (a copy, so callers can modify it)
+    '''
+    def roster(self) -> pd.DataFrame:
+        return self._cached("roster", lambda: pd.DataFrame(self.backend.select(ROSTER_TABLE))).copy()
+
+    '''
+    Admin emails as a set. The same object is returned until the list is reloaded (after
+    admin_ttl or invalidate("admins")), which lets callers skip re-checking membership.
+    '''
+    def admin_emails(self) -> frozenset:
+        return self._cached(
+            "admins", lambda: frozenset(row["email"] for row in self.backend.select(ADMINS_TABLE, "email")), self.admin_ttl
+        )
+
+    def add_admins(self, emails):
+        self.backend.upsert(ADMINS_TABLE, [{"email": e} for e in emails], on_conflict="email")
+        self.invalidate("admins")
+
+    # insert or update a form response, keyed by email
+    def save_response(self, response):
+        self.backend.upsert(ROSTER_TABLE, [response], on_conflict="email")
+        self.invalidate("roster")
+
+    '''
+    Set is_leader from {name: bool}. Only rows that change are written, in one upsert.
+    Returns the number of people updated.
+    '''
+    def set_leaders(self, leaders):
+        roster = self.roster()
+        if roster.empty:
+            return 0
+        current = roster["is_leader"].fillna(False).astype(bool) if "is_leader" in roster else pd.Series(False, index=roster.index)
+        wanted = roster["name"].map(leaders).fillna(current).astype(bool)
+        changed = roster[wanted != current].copy()
+        if changed.empty:
+            return 0
+
+        changed["is_leader"] = wanted[changed.index]
+        # to_json turns numpy values and NaN into plain JSON types for the request
+        rows = json.loads(changed.to_json(orient="records"))
+        self.backend.upsert(ROSTER_TABLE, rows, on_conflict="email")
+        self.invalidate("roster")
+        return len(rows)
+
+
+def backend_name():
+    return st.secrets.get("DATA_BACKEND", "supabase")
+
+
+'''
+The Supabase connection, or None when DATA_BACKEND is "sqlite"
+'''
+def get_connection():
+    if backend_name() == "sqlite":
+        return None
+    from st_supabase_connection import SupabaseConnection
+    return st.connection("supabase", type=SupabaseConnection)
+
+
+'''
+Repository shared by every session and both pages. `_conn` is the Supabase connection
+(not hashed by Streamlit); it isn't used when DATA_BACKEND is "sqlite".
+'''
+@st.cache_resource
+def get_repository(_conn=None):
+    if backend_name() == "sqlite":
+        backend = SQLiteBackend(st.secrets.get("SQLITE_PATH", "scheduler.db"))
+    else:
+        backend = SupabaseBackend(_conn)
+    return Repository(
+        backend,
+        ttl=st.secrets.get("DATA_TTL_SECONDS", 60),
+        admin_ttl=st.secrets.get("ADMIN_TTL_SECONDS", 600),
+    )
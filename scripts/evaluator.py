@@ -0,0 +1,213 @@
+'''
+Live checking of schedules edited on the admin page, without building or solving a model.
+
+A ScheduleEvaluator holds a schedule as arrays (assignments P x T x I, leaders P x T) plus
+running totals, and keeps track of
+    - broken rules per cell: availability, instruments people play, one instrument per
+      person, no singing with cajon/strings, players per instrument, the weekly leader
+      (who must sing and play), and names that aren't on the roster
+    - leaders outside their rotation bounds
+    - the objective terms of ScheduleBuilder: frequency deviation, spacing, leader gaps and
+      optional instrument rewards
+set_cell() changes one cell and only rechecks that week and the people in the cell, so a
+single edit takes microseconds.
+'''
+import numpy as np
+
+from scripts.scheduling_logic import (
+    instrument_counts, lead_instrument, leader_gap_pairs, no_singing_with, optional_instruments, penalty_counts,
+    weighted_penalties,
+)
+from scripts.utils import cell_names
+
+
+class ScheduleEvaluator:
+    '''
+    `builder` is a ScheduleBuilder; only its parsed roster, targets and leader bounds are
+    used, build_model() is not needed.
+    '''
+    def __init__(self, builder, schedule=None):
+        self.roster = builder.roster
+        self.P, self.T, self.I = builder.P, builder.T, builder.I_all
+        self.targets = builder.targets
+        self.spacing = builder.spacing
+        self.leader_bounds = builder.leader_bounds
+        r = self.roster
+        self.col = r.instrument_index
+        self.no_vox = np.array([i != "vocals" for i in self.I])
+        self.no_sing = np.array([i in no_singing_with + ["vocals"] for i in self.I])
+        self.optional = np.array([i in optional_instruments for i in self.I])
+        self.lead_instrument = lead_instrument(r)
+
+        self.load(schedule or {})
+
+    '''
+    Replace the whole schedule ({week: {instrument: [people], 'Leader': leader}}) and
+    recompute everything
+    '''
+    def load(self, schedule):
+        P, T, I = len(self.P), len(self.T), len(self.I)
+        self.x = np.zeros((P, T, I), dtype=bool)
+        self.lead = np.zeros((P, T), dtype=bool)
+        self.unknown = {}  # (week, row) -> names that aren't on the roster
+        for w, cells in schedule.items():
+            if w not in self.roster.week_index:
+                continue
+            for row, names in cells.items():
+                self._assign(w, row, [names] if isinstance(names, str) else names or [])
+
+        self.scheduled = self.x.any(axis=2)
+        self.total = self.scheduled.sum(axis=1)
+        counts = penalty_counts(self.x[None], self.lead[None], self.targets, self.spacing, self.I)
+        self.freq, self.spacing_pen, self.gap_pen = counts["frequency"][0], counts["spacing"][0], counts["leader gap"][0]
+        self.cell_issues = {}  # (week, row) -> [messages]
+        self.person_issues = {}  # person -> [messages]
+        for k in range(P):
+            self._check_person(k)
+        for t in range(T):
+            self._check_week(t)
+
+    '''
+    Set one cell to the given names (row is an instrument or 'Leader'), update the totals of
+    the people leaving or joining it and recheck that week. Returns the people affected.
+    '''
+    def set_cell(self, week, row, names):
+        if week not in self.roster.week_index:
+            return []
+        t = self.roster.week_index[week]
+        before = np.flatnonzero(self.lead[:, t] if row == 'Leader' else self.x[:, t, self.col[row]])
+        after = self._assign(week, row, names)
+        affected = set(before.tolist()) | set(after)
+        for k in affected:
+            if self.x[k, t].any() != self.scheduled[k, t]:
+                self._toggle_week(k, t)
+            if row == 'Leader':
+                self._update_gap(k)
+                self._check_person(k)
+        self._check_week(t)
+        return [self.P[k] for k in affected]
+
+    def set_table_cell(self, week, row, cell):
+        return self.set_cell(week, row, cell_names(cell))
+
+    # write a cell into the arrays, returns the person indices now in it
+    def _assign(self, week, row, names):
+        t = self.roster.week_index[week]
+        known = [self.roster.person_index[n] for n in names if n in self.roster.person_index]
+        unknown = [n for n in names if n not in self.roster.person_index]
+        if unknown:
+            self.unknown[(week, row)] = unknown
+        else:
+            self.unknown.pop((week, row), None)
+
+        if row == 'Leader':
+            self.lead[:, t] = False
+            self.lead[known, t] = True
+        else:
+            j = self.col[row]
+            self.x[:, t, j] = False
+            self.x[known, t, j] = True
+        return known
+
+    # person k goes from scheduled to not scheduled in week index t or back: only the
+    # spacing pairs (see penalty_counts) with the weeks around t change
+    def _toggle_week(self, k, t):
+        d = int(self.spacing[k])
+        s = self.scheduled[k]
+        close = int(s[max(0, t - d):t].sum() + s[t + 1:t + d + 1].sum())
+        sign = -1 if s[t] else 1
+        s[t] = not s[t]
+        self.total[k] += sign
+        self.freq[k] = abs(int(self.targets[k]) - int(self.total[k]))
+        self.spacing_pen[k] += sign * close
+
+    def _update_gap(self, k):
+        self.gap_pen[k] = leader_gap_pairs(self.lead[k])
+
+    def _check_person(self, k):
+        p = self.P[k]
+        if p not in self.leader_bounds:
+            return
+        lo, hi = self.leader_bounds[p]
+        times = int(self.lead[k].sum())
+        if lo <= times <= hi:
+            self.person_issues.pop(p, None)
+        else:
+            self.person_issues[p] = [f"{p} leads {times} weeks, should lead {lo}-{hi}"]
+
+    # recheck every cell of week index t
+    def _check_week(self, t):
+        r = self.roster
+        w = self.T[t]
+        x = self.x[:, t]
+        in_week = np.flatnonzero(x.any(axis=1))
+        # people on more than one instrument / singing with cajon or strings this week
+        doubled = set(in_week[(x[in_week] & self.no_vox).sum(axis=1) > 1].tolist())
+        sings_and_plays = set(in_week[(x[in_week] & self.no_sing).sum(axis=1) > 1].tolist())
+        for j, i in enumerate(self.I):
+            issues = []
+            people = np.flatnonzero(x[:, j])
+            lo, hi = instrument_counts.get(i, (0, len(self.P)))
+            if len(people) < lo:
+                issues.append(f"Needs {lo} on {i}, has {len(people)}")
+            elif len(people) > hi:
+                issues.append(f"At most {hi} on {i}, has {len(people)}")
+            for k in people:
+                p = self.P[k]
+                if not r.availability[k, t]:
+                    issues.append(f"{p} isn't available")
+                if not r.capability[k, j]:
+                    issues.append(f"{p} doesn't play {i}")
+                if self.no_vox[j] and k in doubled:
+                    issues.append(f"{p} is on more than one instrument")
+                if self.no_sing[j] and k in sings_and_plays:
+                    issues.append(f"{p} can't sing and play cajon/strings")
+            self._set_issues((w, i), issues)
+
+        issues = []
+        leaders = np.flatnonzero(self.lead[:, t])
+        if len(leaders) != 1:
+            issues.append("No leader" if not len(leaders) else f"{len(leaders)} leaders")
+        for k in leaders:
+            p = self.P[k]
+            if not r.is_leader[k]:
+                issues.append(f"{p} isn't a leader")
+            if not r.availability[k, t]:
+                issues.append(f"{p} isn't available")
+            if not x[k, self.col["vocals"]]:
+                issues.append(f"{p} leads but isn't singing")
+            if self.lead_instrument[k] >= 0 and not x[k, self.lead_instrument[k]]:
+                issues.append(f"{p} leads but isn't on {self.I[self.lead_instrument[k]]}")
+        self._set_issues((w, 'Leader'), issues)
+
+    def _set_issues(self, cell, issues):
+        issues += [f"{n} isn't on the roster" for n in self.unknown.get(cell, [])]
+        if issues:
+            self.cell_issues[cell] = issues
+        else:
+            self.cell_issues.pop(cell, None)
+
+    @property
+    def valid(self):
+        return not self.cell_issues and not self.person_issues
+
+    '''
+    Objective terms, weighted like ScheduleBuilder's objective. For a schedule the solver
+    returned, "objective" equals the solver's objective value.
+    '''
+    def penalties(self):
+        counts = {
+            "frequency": self.freq, "spacing": self.spacing_pen, "leader gap": self.gap_pen,
+            "optional": (self.x & self.optional).sum(axis=(1, 2)),
+        }
+        return {term: int(v[0]) for term, v in weighted_penalties({t: c[None] for t, c in counts.items()}).items()}
+
+    @property
+    def objective(self):
+        return self.penalties()["objective"]
+
+    # every problem as {"week", "row", "issue"} (week and row are None for rotation bounds)
+    def violations(self):
+        rows = [{"week": w, "row": row, "issue": m} for (w, row), ms in sorted(self.cell_issues.items(), key=lambda c: (c[0][0], str(c[0][1]))) for m in ms]
+        rows += [{"week": None, "row": None, "issue": m} for ms in self.person_issues.values() for m in ms]
+        return rows
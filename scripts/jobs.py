@@ -0,0 +1,358 @@
+'''
+Background solve jobs.
+
+CP-SAT releases the GIL while it searches, so a small thread pool is enough to keep
+long solves off the Streamlit script thread. A JobRunner accepts a solve request and
+returns a SolveJob handle that the page can poll for progress, intermediate objective
+values and the final result, or cancel.
+
+Finished solution sets are cached by roster fingerprint, so resubmitting an unchanged
+roster with the same options completes instantly, and built models are reused in memory.
+When only a few people changed since the last job, that job's model is updated in place
+(ScheduleBuilder.update_roster) and hinted with its last schedule instead of rebuilt.
+Finished jobs stay with the runner until the page releases them (or job_ttl seconds after
+they finish, for pages that never came back), and drop their builder as soon as they finish
+so only the runner's model cache holds built models.
+With a snapshot_dir, every model is saved there before it is solved (scripts.snapshot), so
+slow or infeasible rosters can be replayed later.
+'''
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from ortools.sat.python.cp_model import INFEASIBLE
+
+from scripts.cache import FingerprintCache, roster_fingerprint
+from scripts.scheduling_logic import ScheduleBuilder, SolutionStream
+from scripts.snapshot import save_snapshot
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+
+class SolveJob:
+    def __init__(self, data, options, runner=None):
+        self.id = uuid.uuid4().hex[:8]
+        self.data = data
+        self.options = options
+
+        self.status = QUEUED
+        self.stage = "Waiting to start"
+        self.found = 0
+        self.requested = options.get("n", 1)
+        self.objectives = []  # (seconds since start, objective value) for every improving solution
+        self.result = None
+        self.issues = []  # why no schedule was found: pre-check problems or conflicting constraint groups
+        self.profile = None  # ModelProfile.to_dict() of the builder once the job finishes
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+        self.runner = runner
+        self.cached = False
+        self.builder = None
+        self.stream = None  # improving schedules of the main search, see best_so_far
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.status in (DONE, CANCELLED, FAILED)
+
+    @property
+    def progress(self):
+        if self.status == DONE:
+            return 1.0
+        return min(self.found / max(self.requested, 1), 1.0)
+
+    @property
+    def best_objective(self):
+        with self._lock:
+            return min((obj for _, obj in self.objectives), default=None)
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    # latest improving schedule of the main search as a SolutionStream update, or None
+    @property
+    def best_so_far(self):
+        stream = self.stream
+        return stream.best if stream is not None else None
+
+    @property
+    def searching(self):
+        stream = self.stream
+        return stream is not None and not stream.closed
+
+    '''
+    Stop the main search and keep the best schedule found so far (alternatives are still
+    collected around it). Unlike cancel() the job finishes normally.
+    '''
+    def finish_early(self):
+        stream = self.stream
+        if stream is not None:
+            stream.stop()
+
+    '''
+    Request cancellation. A queued job never starts, a running one stops its solver.
+    '''
+    def cancel(self):
+        with self._lock:
+            self._cancelled = True
+            builder = self.builder
+        if builder is not None:
+            builder.cancel()
+
+    def _on_progress(self, found, n, objective, seconds):
+        with self._lock:
+            self.found = found
+            if self.options.get("mode") == "rolling":
+                self.stage = f"Planned {found} of {n} weeks"
+            else:
+                self.stage = f"Found {found} of {n} schedules" if found else "Searching for the best schedule"
+            self.objectives.append((round(self.elapsed, 2), objective))
+
+    def _finish_cached(self, result):
+        self.cached = True
+        self.result = result
+        self.found = len(result)
+        self.status = DONE
+        self.stage = f"Loaded {len(result)} saved schedules"
+        self.started_at = self.finished_at = time.monotonic()
+
+    def _set_stage(self, stage):
+        with self._lock:
+            self.stage = stage
+
+    def _solve(self, builder):
+        # a reused builder keeps the last job's settings, so always set them
+        builder.set_solve_profile(**self.options.get("solve_profile", {}))
+        # rolling solves have no single model up front to snapshot
+        if self.runner and self.runner.snapshot_dir and self.options.get("mode") != "rolling":
+            self.runner.save_snapshot(self.data, builder)
+
+        if self.options.get("mode") == "rolling":
+            self._set_stage("Planning in rolling windows")
+            with self._lock:
+                self.requested = len(builder.T)
+            return builder.solve_rolling(
+                window=self.options.get("window", 10),
+                step=self.options.get("step", 5),
+                time_limit=self.options.get("time_limit"),
+                on_progress=self._on_progress,
+            )
+
+        if self.options.get("mode") == "leader_first":
+            self._set_stage("Planning leaders, then instruments")
+            return builder.solve_decomposed(
+                time_limit=self.options.get("time_limit"),
+                compare_joint=self.options.get("compare_joint", False),
+                on_progress=self._on_progress,
+            )
+
+        if self.options.get("mode") == "repair":
+            self._set_stage("Repairing schedule")
+            return builder.repair(
+                self.options["schedule"],
+                locked=self.options.get("locked", ()),
+                time_limit=self.options.get("time_limit"),
+                on_progress=self._on_progress,
+            )
+
+        self._set_stage("Searching for the best schedule")
+        self.stream = SolutionStream()
+        return builder.get_solution_pool(
+            n=self.options.get("n", 1),
+            min_distance=self.options.get("min_distance", 1),
+            gap=self.options.get("gap", 0.05),
+            time_limit=self.options.get("time_limit"),
+            on_progress=self._on_progress,
+            stream=self.stream,
+        )
+
+    def run(self):
+        with self._lock:
+            if self._cancelled:
+                self.status = CANCELLED
+                self.finished_at = time.monotonic()
+                return
+            self.status = RUNNING
+            self.started_at = time.monotonic()
+
+        try:
+            self._set_stage("Building model")
+            # rolling solves build a small model per window (and the full one only to check
+            # the result), so they get a builder of their own and never touch the cached models
+            rolling = self.options.get("mode") == "rolling"
+            reuse = self.runner is not None and not rolling
+            builder = self.runner.get_builder(self.data) if reuse else None
+            updated = None
+            if builder is not None:
+                builder.profile.reset()  # only this job's work shows up in its profile
+            else:
+                updated = self.runner.take_latest_builder() if reuse else None
+                if updated is not None:
+                    self._set_stage("Updating model")
+                    updated.profile.reset()
+                    updated.update_roster(self.data)
+                    self.runner.put_builder(self.data, updated)
+                builder = updated or ScheduleBuilder(data=self.data, n=self.options.get("n", 1))
+
+                # fail in milliseconds when a week is obviously short of people
+                issues = builder.check_feasibility()
+                if issues:
+                    with self._lock:
+                        self.issues = issues
+                        self.profile = builder.profile.to_dict()
+                        self.result = []
+                        self.status = DONE
+                        self.stage = "Roster can't be scheduled"
+                    return
+
+                if updated is None and not rolling:
+                    builder.build_model(sparse=True, symmetry_breaking=True)
+                    if self.runner:
+                        self.runner.put_builder(self.data, builder)
+
+            with self._lock:
+                builder.cancelled = False
+                self.builder = builder
+                if self._cancelled:
+                    builder.cancel()
+
+            result = self._solve(builder)
+
+            if not result and not self._cancelled:
+                if builder.status == INFEASIBLE:
+                    self._set_stage("Finding conflicting constraints")
+                    edits = {}
+                    if self.options.get("mode") == "repair":
+                        edits = {"schedule": self.options["schedule"], "locked": self.options.get("locked", ())}
+                    self.issues = builder.explain_infeasibility(**edits) or ["The constraints conflict"]
+                elif builder.status not in (INFEASIBLE, None):
+                    self.issues = ["No schedule found within the time limit"]
+
+            with self._lock:
+                self.result = result
+                self.profile = builder.profile.to_dict()
+                if self.options.get("mode") == "leader_first":
+                    self.profile["decomposition"] = dict(builder.decomposition)
+                self.status = CANCELLED if self._cancelled else DONE
+                self.stage = "Cancelled" if self._cancelled else f"Found {len(result)} schedules"
+
+            # only complete runs are cached, a cancelled run may be missing schedules
+            if self.status == DONE and result and self.runner:
+                self.runner.cache.put(roster_fingerprint(self.data, self.options), result)
+        except Exception as e:
+            with self._lock:
+                self.error = e
+                self.status = FAILED
+                self.stage = "Failed"
+        finally:
+            with self._lock:
+                self.builder = None  # the model stays in the runner's cache, if anywhere
+                self.finished_at = time.monotonic()
+
+
+class JobRunner:
+    def __init__(self, max_workers=1, cache=None, max_models=4, snapshot_dir=None, job_ttl=600):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="solve")
+        self.jobs = {}
+        self.job_ttl = job_ttl  # seconds a finished job waits to be released
+        self.cache = cache if cache is not None else FingerprintCache()
+        # built models are large and hold solver state, keep only a few and never on disk
+        self.models = FingerprintCache(max_entries=max_models)
+        self.latest = None  # (fingerprint, builder) of the last model used, see take_latest_builder
+        self.snapshot_dir = snapshot_dir
+        if snapshot_dir:
+            os.makedirs(snapshot_dir, exist_ok=True)
+        self._lock = threading.Lock()
+
+    '''
+    Queue a solve of `data` and return its job handle.
+    Options are passed to ScheduleBuilder.get_solution_pool (n, min_distance, gap, time_limit),
+    to ScheduleBuilder.repair when mode="repair" (schedule, locked, time_limit), or to
+    ScheduleBuilder.solve_rolling when mode="rolling" (window, step, time_limit), or to
+    ScheduleBuilder.solve_decomposed when mode="leader_first" (time_limit, compare_joint).
+    solve_profile is a dict for ScheduleBuilder.set_solve_profile, e.g. one of solve_presets.
+    '''
+    def submit(self, data, **options) -> SolveJob:
+        self.prune()
+        job = SolveJob(data, options, runner=self)
+        with self._lock:
+            self.jobs[job.id] = job
+
+        cached = self.cache.get(roster_fingerprint(data, options))
+        if cached is not None:
+            job._finish_cached(cached)
+        else:
+            self.executor.submit(job.run)
+        return job
+
+    def get_builder(self, data):
+        key = roster_fingerprint(data, {"sparse": True})
+        builder = self.models.get(key)
+        if builder is not None:
+            with self._lock:
+                self.latest = (key, builder)
+        return builder
+
+    def put_builder(self, data, builder):
+        key = roster_fingerprint(data, {"sparse": True})
+        self.models.put(key, builder, persist=False)
+        with self._lock:
+            self.latest = (key, builder)
+
+    '''
+    The last model used, taken out of the cache so it can be updated to another roster.
+    None when there is none or a running job still uses it.
+    '''
+    def take_latest_builder(self):
+        with self._lock:
+            if self.latest is None:
+                return None
+            key, builder = self.latest
+            if any(job.builder is builder and not job.done for job in self.jobs.values()):
+                return None
+            self.latest = None
+        self.models.pop(key)
+        return builder
+
+    # one snapshot per roster, <snapshot_dir>/<fingerprint>.npz
+    def save_snapshot(self, data, builder):
+        path = os.path.join(self.snapshot_dir, f"{roster_fingerprint(data, {'sparse': True})[:16]}.npz")
+        try:
+            if not os.path.exists(path):
+                save_snapshot(builder, path)
+        except OSError:
+            pass  # a full or read-only disk shouldn't fail the solve
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    # forget a job once the page has taken its result
+    def release(self, job_id):
+        with self._lock:
+            self.jobs.pop(job_id, None)
+
+    # drop finished jobs that were never released (closed tabs, replaced solves)
+    def prune(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [job_id for job_id, job in self.jobs.items()
+                       if job.done and job.finished_at is not None and now - job.finished_at > self.job_ttl]
+            for job_id in expired:
+                del self.jobs[job_id]
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None:
+            job.cancel()
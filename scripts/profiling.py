@@ -0,0 +1,128 @@
+'''
+Timing and solver statistics for one ScheduleBuilder.
+
+A ModelProfile collects
+    phases     wall time per phase (parse data, variables, constraints, objective, extraction)
+    families   wall time plus variables/constraints added by each constraint family
+    solves     CP-SAT statistics for every solve: status, conflicts, branches, wall time,
+               presolve and search time, objective, best bound and gap
+and turns them into plain dicts (to_dict) or DataFrames (tables) for display.
+'''
+import re
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+from ortools.sat.python.cp_model import FEASIBLE, INFEASIBLE, OPTIMAL, MODEL_INVALID, UNKNOWN
+
+status_names = {OPTIMAL: "OPTIMAL", FEASIBLE: "FEASIBLE", INFEASIBLE: "INFEASIBLE", MODEL_INVALID: "MODEL_INVALID", UNKNOWN: "UNKNOWN"}
+
+# CP-SAT log lines marking the start of presolve and of the search
+presolve_start = re.compile(r"^Starting presolve at ([\d.]+)s")
+search_start = re.compile(r"^Starting search at ([\d.]+)s")
+
+
+class ModelProfile:
+    def __init__(self):
+        self.phases = {}
+        self.families = {}
+        self.solves = []
+
+    '''
+    Time a phase, adding to any earlier time recorded under the same name
+    '''
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    '''
+    Time a constraint family and count the variables and constraints it adds to `model`
+    '''
+    @contextmanager
+    def family(self, name, model):
+        proto = model.Proto()
+        variables, constraints = len(proto.variables), len(proto.constraints)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats = self.families.setdefault(name, {"seconds": 0.0, "variables": 0, "constraints": 0})
+            stats["seconds"] += time.perf_counter() - start
+            stats["variables"] += len(proto.variables) - variables
+            stats["constraints"] += len(proto.constraints) - constraints
+
+    # start over when a built model is reused for another run (e.g. the next job)
+    def reset(self):
+        self.phases.clear()
+        self.families.clear()
+        self.solves.clear()
+
+    # forget the model-building numbers before a rebuild
+    def reset_build(self):
+        for name in ("variables", "constraints", "objective"):
+            self.phases.pop(name, None)
+        self.families.clear()
+
+    '''
+    Record the statistics of a finished solve. `log` is the list of CP-SAT log lines, used
+    to split the wall time into presolve and search. Feasibility searches (no objective)
+    get no objective, bound or gap.
+    '''
+    def record_solve(self, label, solver, status, log=(), has_objective=True):
+        response = solver.ResponseProto()
+        found = status in (OPTIMAL, FEASIBLE) and has_objective
+        objective = response.objective_value if found else None
+        bound = response.best_objective_bound
+
+        presolve_at = search_at = None
+        for line in log:
+            if presolve_at is None and (m := presolve_start.match(line)):
+                presolve_at = float(m.group(1))
+            elif search_at is None and (m := search_start.match(line)):
+                search_at = float(m.group(1))
+
+        self.solves.append({
+            "solve": label,
+            "status": status_names.get(status, str(status)),
+            "wall_time": response.wall_time,
+            "user_time": response.user_time,
+            "deterministic_time": response.deterministic_time,
+            "presolve_time": search_at - (presolve_at or 0.0) if search_at is not None else None,
+            "search_time": response.wall_time - search_at if search_at is not None else None,
+            "conflicts": response.num_conflicts,
+            "branches": response.num_branches,
+            "booleans": response.num_booleans,
+            "objective": objective,
+            "best_bound": bound if found else None,
+            # relative distance between the schedule found and the best possible one
+            "gap": abs(objective - bound) / max(1.0, abs(objective)) if found else None,
+        })
+
+    def to_dict(self):
+        return {
+            "phases": dict(self.phases),
+            "families": {name: dict(stats) for name, stats in self.families.items()},
+            "solves": [dict(s) for s in self.solves],
+        }
+
+    '''
+    (phases, families, solves) DataFrames from a profile or its to_dict() snapshot
+    '''
+    @staticmethod
+    def tables(profile):
+        if isinstance(profile, ModelProfile):
+            profile = profile.to_dict()
+        phases = pd.DataFrame(
+            [{"phase": name, "seconds": round(seconds, 4)} for name, seconds in profile["phases"].items()],
+            columns=["phase", "seconds"],
+        )
+        families = pd.DataFrame(
+            [{"family": name, **stats} for name, stats in profile["families"].items()],
+            columns=["family", "seconds", "variables", "constraints"],
+        ).round({"seconds": 4})
+        solves = pd.DataFrame(profile["solves"])
+        return phases, families, solves
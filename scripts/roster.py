@@ -0,0 +1,108 @@
+'''
+Compact roster representation used by the scheduler.
+
+Holds the team_availability table as dense NumPy arrays so that model building,
+diagnostics and pre-checks index arrays instead of doing scalar DataFrame.loc lookups:
+    availability  (P x T) bool   person is free in week T[t]
+    capability    (P x I) bool   person plays instrument I[j]
+    is_leader     (P,)    bool
+    num_weeks     (P,)    int    requested frequency per quarter
+    spacing       (P,)    int    desired weeks between services, from num_weeks
+'''
+import numpy as np
+import pandas as pd
+
+from scripts.utils import instruments, week_columns
+
+# desired spacing in weeks, based on how often a person wants to be scheduled
+num_weeks_to_spacing = {
+    1: 4,
+    2: 3,
+    3: 2,
+    4: 1
+}
+
+
+class Roster:
+    def __init__(self, names, weeks, availability, capability, is_leader, num_weeks, instrument_names=instruments):
+        self.names = list(names)
+        self.weeks = list(weeks)
+        self.instruments = list(instrument_names)
+        self.availability = np.asarray(availability, dtype=bool).reshape(len(self.names), len(self.weeks))
+        self.capability = np.asarray(capability, dtype=bool).reshape(len(self.names), len(self.instruments))
+        self.is_leader = np.asarray(is_leader, dtype=bool)
+        self.num_weeks = np.asarray(num_weeks, dtype=int)
+
+        spacing_lookup = np.zeros(max(num_weeks_to_spacing) + 1, dtype=int)
+        for k, v in num_weeks_to_spacing.items():
+            spacing_lookup[k] = v
+        self.spacing = spacing_lookup[self.num_weeks] if len(self.num_weeks) else self.num_weeks.copy()
+
+        self.person_index = {p: k for k, p in enumerate(self.names)}
+        self.week_index = {w: t for t, w in enumerate(self.weeks)}
+        self.instrument_index = {i: j for j, i in enumerate(self.instruments)}
+
+    '''
+    Build a roster from a team_availability shaped DataFrame. Missing values count as False;
+    `weeks` restricts the horizon to those week numbers.
+    '''
+    @classmethod
+    def from_dataframe(cls, data: pd.DataFrame, weeks=None):
+        weeks = list(weeks) if weeks is not None else week_columns(data)
+        is_leader = data['is_leader'] if 'is_leader' in data.columns else pd.Series(False, index=data.index)
+        return cls(
+            names=data['name'],
+            weeks=weeks,
+            availability=data[[f'w{w}' for w in weeks]].fillna(False).to_numpy(dtype=bool),
+            capability=data[instruments].fillna(False).to_numpy(dtype=bool),
+            is_leader=is_leader.fillna(False).to_numpy(dtype=bool),
+            num_weeks=data['num_weeks'].to_numpy(dtype=int),
+        )
+
+    '''
+    Same roster restricted to a subset of its weeks
+    '''
+    def select_weeks(self, weeks):
+        cols = [self.week_index[w] for w in weeks]
+        return Roster(self.names, weeks, self.availability[:, cols], self.capability, self.is_leader, self.num_weeks, self.instruments)
+
+    '''
+    Same roster restricted to the people at the given row indices
+    '''
+    def select_people(self, rows):
+        rows = list(rows)
+        return Roster([self.names[k] for k in rows], self.weeks, self.availability[rows], self.capability[rows],
+                      self.is_leader[rows], self.num_weeks[rows], self.instruments)
+
+    '''
+    This roster followed by the people of `other`, which has the same weeks and instruments
+    '''
+    def append(self, other):
+        return Roster(
+            self.names + other.names, self.weeks,
+            np.vstack([self.availability, other.availability]),
+            np.vstack([self.capability, other.capability]),
+            np.concatenate([self.is_leader, other.is_leader]),
+            np.concatenate([self.num_weeks, other.num_weeks]),
+            self.instruments,
+        )
+
+    @property
+    def leaders(self):
+        return [p for p, lead in zip(self.names, self.is_leader) if lead]
+
+    # (P x T x I) bool: person is available that week and plays the instrument
+    @property
+    def feasible(self):
+        return self.availability[:, :, None] & self.capability[:, None, :]
+
+    # (P x T) bool: leader who sings and is available that week
+    @property
+    def can_lead(self):
+        return self.availability & (self.is_leader & self.capability[:, self.instrument_index["vocals"]])[:, None]
+
+    def plays(self, person, instrument):
+        return bool(self.capability[self.person_index[person], self.instrument_index[instrument]])
+
+    def __len__(self):
+        return len(self.names)
@@ -1,72 +1,479 @@
-from scripts.utils import instruments
+from scripts.utils import weeks_per_quarter, leader_weeks_per_quarter
+from scripts.roster import Roster
+from scripts.profiling import ModelProfile
+import math
+import queue
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
-from ortools.sat.python.cp_model import CpModel, CpSolver
+from ortools.sat.python.cp_model import CpModel, CpSolver, CpSolverSolutionCallback, FEASIBLE, INFEASIBLE, OPTIMAL
 
+# Solve profiles offered on the admin page (see ScheduleBuilder.set_solve_profile).
+# workers=0 lets CP-SAT start one search worker per core.
+solve_presets = {
+    "fast draft": {"workers": 0, "time_limit": 10, "relative_gap": 0.05},
+    "balanced": {"workers": 0, "time_limit": 30, "relative_gap": 0.01},
+    "best": {"workers": 0, "time_limit": 120, "relative_gap": 0.0},
+}
+
+# weights of the objective terms
+objective_weights = {"frequency": 2, "spacing": 3, "leader gap": 1, "optional": 1}
+# leaders should lead at most once in this many weeks
+lead_gap = 3
+
+# players needed per week: instrument -> (min, max)
+instrument_counts = {
+    "acoustic_guitar": (1, 1),
+    "piano": (1, 1),
+    "vocals": (3, 3),
+    "electric_guitar": (0, 1),
+    "strings": (0, 1),
+    "cajon": (0, 1),
+}
+# no minimum, each player is rewarded in the objective
+optional_instruments = [i for i, (lo, _) in instrument_counts.items() if lo == 0]
+# nobody sings while playing these
+no_singing_with = ["cajon", "strings"]
+# leaders sing and play the first of these they play
+lead_instruments = ["acoustic_guitar", "piano"]
+
+
+'''
+Column of the instrument each person of `roster` plays while leading, -1 if they play none
+of lead_instruments
+'''
+def lead_instrument(roster):
+    seat = np.full(len(roster), -1)
+    for i in reversed(lead_instruments):
+        j = roster.instrument_index[i]
+        seat[roster.capability[:, j]] = j
+    return seat
+
+
+'''
+Unweighted objective terms of n stacked schedules, counted like the penalties of
+ScheduleBuilder.define_penalities_and_objective:
+    x            (n x P x T x I) assignments, columns in the order of `instruments`
+    lead         (n x P x T) leaders
+    targets      weeks each person should be scheduled
+    spacing      weeks each person wants between scheduled weeks
+Returns {term: n x P array} for frequency deviation, spacing pairs, leader gap pairs and
+optional instruments played.
+'''
+def penalty_counts(x, lead, targets, spacing, instruments):
+    scheduled = x.any(axis=3)  # n x P x T
+    frequency = np.abs(targets - scheduled.sum(axis=2))
+
+    # pairs of scheduled weeks closer together than each person's spacing
+    spacing_pairs = np.zeros(scheduled.shape[:2], dtype=int)
+    for d in range(1, int(spacing.max(initial=0)) + 1):
+        both = (scheduled[..., :-d] & scheduled[..., d:]).sum(axis=2)
+        spacing_pairs += np.where(spacing >= d, both, 0)
+
+    optional = x[..., [i in optional_instruments for i in instruments]].sum(axis=(2, 3))
+    return {"frequency": frequency, "spacing": spacing_pairs, "leader gap": leader_gap_pairs(lead), "optional": optional}
+
+
+# pairs of weeks led too close together (those of leader_gap_penalties), over the last axis of lead
+def leader_gap_pairs(lead):
+    m = lead.shape[-1] - lead_gap
+    pairs = np.zeros(lead.shape[:-1], dtype=int)
+    for d in range(1, lead_gap if m > 0 else 0):
+        pairs += (lead[..., :m] & lead[..., d:m + d]).sum(axis=-1)
+    return pairs
+
+
+'''
+Objective terms per schedule from penalty_counts, weighted like the builder's objective
+(optional instruments count against it), plus their sum as "objective"
+'''
+def weighted_penalties(counts):
+    terms = {term: (-1 if term == "optional" else 1) * objective_weights[term] * c.sum(axis=1) for term, c in counts.items()}
+    terms["objective"] = sum(terms.values())
+    return terms
+
+
+'''
+Solution callback that reports each improving objective value and stops the search
+once the builder has been cancelled.
+'''
+class ProgressCallback(CpSolverSolutionCallback):
+    def __init__(self, builder, on_solution=None):
+        super().__init__()
+        self.builder = builder
+        self.on_solution = on_solution
+
+    def on_solution_callback(self):
+        if self.on_solution:
+            self.on_solution(self.objective_value, self.wall_time)
+        if self.builder.cancelled:
+            self.stop_search()
+
+
+'''
+Thread-safe stream of the improving schedules of a running solve.
+
+Each update is a dict with the schedule ("solution", "diagnostics"), its "objective" and the
+"seconds" since the solve started. Iterating blocks until the next update and ends when the
+solve finishes; `best` is always the latest update. stop() ends the search early and keeps
+the best schedule found so far.
+'''
+class SolutionStream:
+    def __init__(self):
+        self.updates = queue.Queue()
+        self.best = None
+        self.status = None
+        self.stopped = False
+        self.closed = False
+        self.solver = None
+        self.thread = None
+
+    def publish(self, update):
+        self.best = update
+        self.updates.put(update)
+
+    def close(self, status):
+        self.status = status
+        self.closed = True
+        self.updates.put(None)
+
+    def stop(self):
+        self.stopped = True
+        if self.solver is not None and not self.closed:
+            self.solver.StopSearch()
+
+    def __iter__(self):
+        while True:
+            update = self.updates.get()
+            if update is None:
+                return
+            yield update
+
+
+'''
+Progress callback that also reads every improving schedule (one batched read of the
+solution) and publishes it to a SolutionStream
+'''
+class StreamingCallback(ProgressCallback):
+    def __init__(self, builder, stream, on_solution=None):
+        super().__init__(builder, on_solution)
+        self.stream = stream
+
+    def on_solution_callback(self):
+        arrays = self.builder.solution_arrays(np.array(self.response_proto.solution, dtype=np.int64))
+        self.stream.publish({
+            "solution": self.builder.extract_solution(arrays),
+            "diagnostics": self.builder.run_diagnostics(arrays),
+            "objective": self.objective_value,
+            "seconds": self.wall_time,
+        })
+        super().on_solution_callback()
+        if self.stream.stopped:
+            self.stop_search()
+
+
+'''
+Builds and solves the scheduling model for one roster.
+
+The planning horizon is every `w<number>` availability column in `data` (or just `weeks`).
+Frequencies (num_weeks) and leader rotation bounds are given per quarter and scaled to the
+horizon; `targets` ({person: weeks}) and `leader_bounds` ({leader: (min, max)}) override them.
+'''
 class ScheduleBuilder: 
-    def __init__(self, data: pd.DataFrame, n: int):
+    def __init__(self, data: pd.DataFrame, n: int, weeks=None, targets=None, leader_bounds=None):
         self.data = data 
-        self.parse_data()
+        self.cancelled = False
+        self.solver = None
+        self.status = None
+        self.groups = None
+        # timings per phase and constraint family, and statistics of every solve
+        self.profile = ModelProfile()
+        self.solver_log = []
+        self.deadline = None
+        self.incumbent = None  # (people, weeks, x, leaders) of the last schedule read, see hint_incumbent
+        self.set_solve_profile()
+        with self.profile.phase("parse data"):
+            self.parse_data(weeks, targets, leader_bounds)
     
-    def parse_data(self):
-        # parse into availability, instruments, and frequency tables 
-        self.availability = self.data[['name', 'w1', 'w2', 'w3', 'w4', 'w5', 'w6', 'w7', 'w8', 'w9', 'w10']]
-        self.instruments = self.data[['name'] + instruments]
-        self.frequencies = self.data[['name', 'num_weeks']]
-
-        indexed_data = self.data.set_index('name')
-        self.availability = self.availability.set_index('name')
-        self.instruments = self.instruments.set_index('name')
-        self.frequencies = self.frequencies.set_index('name')
-
-        # add a spacing column for each row, calculated based on the number of weeks. 
-        num_weeks_to_spacing = {
-            1: 4,
-            2: 3, 
-            3: 2, 
-            4: 1
-        }
+    def parse_data(self, weeks=None, targets=None, leader_bounds=None):
+        # data is a team_availability DataFrame or an already parsed Roster
+        if isinstance(self.data, Roster):
+            self.roster = self.data if weeks is None else self.data.select_weeks(weeks)
+        else:
+            self.roster = Roster.from_dataframe(self.data, weeks)
+
+        self.T = self.roster.weeks
+        self.P = self.roster.names # list of people
+        self.leaders = self.roster.leaders
+
+        self.I_all = self.roster.instruments
+        self.I_no_vox = [i for i in self.I_all if i != "vocals"]
+
+        # num_weeks is per quarter, scale it to the length of the horizon
+        scale = len(self.T) / weeks_per_quarter
+        self.targets = np.rint(self.roster.num_weeks * scale).astype(int)
+        if targets is not None:
+            self.targets = np.array([targets.get(p, 0) for p in self.P], dtype=int)
+        self.spacing = self.roster.spacing
 
-        self.P = list(self.data["name"]) # list of people
-        self.frequencies['spacing'] = [num_weeks_to_spacing[indexed_data.loc[person, 'num_weeks']] for person in self.P]
-        self.leaders = [person for person in self.P if indexed_data.loc[person, 'is_leader']]
+        default_bounds = self.default_leader_bounds()
+        self.leader_bounds = {l: (leader_bounds or {}).get(l, default_bounds) for l in self.leaders}
 
-        self.I_all = instruments
-        self.I_no_vox = [i for i in instruments if i != "vocals"]
-        self.T = list(range(1, 11))
+    # leader rotation bounds per quarter, scaled to the length of the horizon. A shorter
+    # horizon never drops the rule that every leader leads at least once.
+    def default_leader_bounds(self):
+        scale = len(self.T) / weeks_per_quarter
+        lo, hi = leader_weeks_per_quarter
+        return (max(1, math.floor(lo * scale)) if lo >= 1 else 0, math.ceil(hi * scale))
 
     '''
     Construct model and define variables
+
+    With sparse=True, variables are only created for feasible (person, week, instrument)
+    triples (person is available that week and can play the instrument). Every other triple
+    is implicitly 0, so the availability/capability constraints disappear from the model.
+
+    penalty_encoding selects how spacing and leader-gap penalties are modelled
+    ("pairwise" or "window", see penalize_pairs).
+
+    With symmetry_breaking=True, searches from scratch run on a copy of the model that
+    orders interchangeable people (see break_symmetry). Models that fix particular people
+    (repair, locked cells, fixed leaders) keep using the plain model.
     '''
-    def build_model(self):
+    def build_model(self, sparse=False, penalty_encoding="pairwise", symmetry_breaking=False):
         self.model = CpModel()
+        self.sparse = sparse
+        self.penalty_encoding = penalty_encoding
+        self.symmetry_breaking = symmetry_breaking
+        self.profile.reset_build()
 
-        # ---- variables ---- #
+        # bookkeeping for add_person / remove_person:
+        # owned[p] lists (first var, end var, first constraint, end constraint) ranges that
+        # only concern person p, week_constraints[(w, i)] (and (w, 'Leader')) the per-week
+        # constraints every assignment variable of that cell is added to, as
+        # [(constraint index, coefficient)]
+        self.owned = {}
+        self.week_constraints = {}
+        self.dead_variables = 0
 
-        # Creates schedule variables.
-        # schedule[(p, w, i)]: person 'p' plays week 'w' on instrument 'o'.
-        self.schedule = {}
-        for p in self.P:
-            for w in self.T:
-                for i in self.I_all:
-                    self.schedule[(p, w, i)] = self.model.new_bool_var(f"x_{p},week{w},{i}")
+        # ---- variables ---- #
+        with self.profile.phase("variables"):
+            # Creates schedule variables.
+            # schedule[(p, w, i)]: person 'p' plays week 'w' on instrument 'o'.
+            # x_index[k, t, j] is the model index of schedule[(P[k], T[t], I[j])], -1 if there is none
+            self.schedule = {}
+            feasible = self.roster.feasible if sparse else np.ones((len(self.P), len(self.T), len(self.I_all)), dtype=bool)
+            self.x_index = np.full(feasible.shape, -1)
+            for k, t, j in zip(*np.nonzero(feasible)):
+                p, w, i = self.P[k], self.T[t], self.I_all[j]
+                self.schedule[(p, w, i)] = self.model.new_bool_var(f"x_{p},week{w},{i}")
+                self.x_index[k, t, j] = self.schedule[(p, w, i)].Index()
 
-        # Create leader variables
-        self.leader_assignments = {}
-        for p in self.leaders:
-            for w in self.T:
+            # Create leader variables
+            self.leader_assignments = {}
+            can_lead = self.roster.can_lead if sparse else self.roster.is_leader[:, None].repeat(len(self.T), axis=1)
+            self.leader_index = np.full(can_lead.shape, -1)
+            for k, t in zip(*np.nonzero(can_lead)):
+                p, w = self.P[k], self.T[t]
                 self.leader_assignments[(p, w)] = self.model.new_bool_var(f"l_{p},{w}") 
+                self.leader_index[k, t] = self.leader_assignments[(p, w)].Index()
 
+            # scheduled_pw[(p, w)] is created in set_constraints
+            self.scheduled_pw = {}
 
-        self.scheduled_pw = {}
-        for p in self.P:
-            for w in self.T:
-                for i in self.I_all:
-                    self.scheduled_pw[(p, w)] = self.model.new_bool_var(f"s_{p},{w}")
+        # ---- constraints and objective ---- #
+        with self.profile.phase("constraints"):
+            self.set_constraints()
+        with self.profile.phase("objective"):
+            self.define_penalities_and_objective()
+
+        self.set_search_model()
+
+    # model for searches from scratch
+    def set_search_model(self):
+        self.search_model = self.model
+        if self.symmetry_breaking:
+            with self.profile.phase("symmetry breaking"):
+                self.search_model = self.model.clone()
+                self.break_symmetry(self.search_model)
+
+    # schedule variables for people playing instrument i in week w
+    def assigned(self, w, i):
+        return [self.schedule[(p, w, i)] for p in self.P if (p, w, i) in self.schedule]
+
+    # schedule variables for person p in week w, restricted to the given instruments
+    def person_week(self, p, w, insts):
+        return [self.schedule[(p, w, i)] for i in insts if (p, w, i) in self.schedule]
+
+    def leaders_in_week(self, w):
+        return [self.leader_assignments[(p, w)] for p in self.leaders if (p, w) in self.leader_assignments]
+
+    def weeks_leading(self, l):
+        return [self.leader_assignments[(l, w)] for w in self.T if (l, w) in self.leader_assignments]
+
+    '''
+    Number of variables and constraints in the built model
+    '''
+    def model_size(self):
+        proto = self.model.Proto()
+        return {
+            "variables": len(proto.variables),
+            "constraints": len(proto.constraints)
+        }
+
+
+    '''
+    Fast pre-check of the hard requirements in set_constraints, run before building a model.
+    Counts available pianists, acoustic guitarists, vocalists and leaders per week and checks
+    the leader rotation bounds. Returns a list of problems (empty when nothing is obviously short).
+    '''
+    def check_feasibility(self):
+        issues = []
+        r = self.roster
+        avail = r.availability.astype(int)
+        caps = r.capability.astype(int)
+        col = r.instrument_index
+
+        # weeks x instruments: number of available people who can play each instrument
+        counts = avail.T @ caps
+
+        required = {i: lo for i, (lo, _) in instrument_counts.items() if lo > 0}
+        for inst, need in required.items():
+            have = counts[:, col[inst]]
+            for t in np.nonzero(have < need)[0]:
+                issues.append(f"Week {self.T[t]}: {have[t]} available on {inst.replace('_', ' ')}, need {need}")
+
+        # nobody plays two required instruments (besides singing) in the same week
+        seats = [col[i] for i in required if i != "vocals"]
+        need = np.array([required[self.I_all[j]] for j in seats])
+        players = avail.T @ r.capability[:, seats].any(axis=1).astype(int)
+        short = (players < need.sum()) & (counts[:, seats] >= need).all(axis=1)
+        names = " and ".join(self.I_all[j].replace("_", " ") for j in seats)
+        for t in np.nonzero(short)[0]:
+            issues.append(f"Week {self.T[t]}: {players[t]} people available for {names}, need {need.sum()}")
+
+        # leaders sing, so a leader can only lead weeks they are available and can sing
+        leaders_per_week = r.can_lead.sum(axis=0)
+        for t in np.nonzero(leaders_per_week < 1)[0]:
+            issues.append(f"Week {self.T[t]}: no leader available")
+
+        min_leads = sum(lo for lo, _ in self.leader_bounds.values())
+        max_leads = sum(hi for _, hi in self.leader_bounds.values())
+        if min_leads > len(self.T):
+            issues.append(f"Leaders must lead {min_leads} times in total but there are only {len(self.T)} weeks")
+        if max_leads < len(self.T):
+            issues.append(f"{len(self.leaders)} leaders can cover at most {max_leads} of {len(self.T)} weeks")
+
+        sings = r.capability[:, col["vocals"]]
+        for k in np.nonzero(r.is_leader & sings & ~r.availability.any(axis=1))[0]:
+            issues.append(f"Leader {self.P[k]} is not available any week")
+        for k in np.nonzero(r.is_leader & ~sings)[0]:
+            issues.append(f"Leader {self.P[k]} doesn't sing, so can't lead")
+
+        return issues
+
+    '''
+    Explain an infeasible model with a minimal set of conflicting constraint groups.
+
+    Builds a separate copy of the model in explain mode, solves it under one assumption per
+    group, then shrinks CP-SAT's core until dropping any remaining group makes it feasible.
+    For a failed repair, pass its schedule and locked cells: every kept edit is a group too,
+    and edits nobody could take are reported without solving.
+    time_limit covers the whole explanation: half for the first solve, the rest split over
+    the deletion filter, which keeps a larger (still conflicting) set when time runs out or
+    the builder is cancelled.
+    Returns [] when the model is feasible or nothing could be proven within the time limit.
+    '''
+    def explain_infeasibility(self, time_limit=10, schedule=None, locked=()):
+        explainer = ScheduleBuilder(
+            self.roster, n=1, targets=dict(zip(self.P, self.targets.tolist())), leader_bounds=self.leader_bounds
+        )
+        explainer.groups = {}
+        explainer.build_model(sparse=True)
+        model = explainer.model
+        model.clear_objective()
+        if schedule is not None:
+            impossible = explainer.guard_edits(schedule, locked)
+            if impossible:
+                return impossible
+
+        # registered as the builder's solver, so cancel() stops it
+        solver = self.solver = CpSolver()
+        solver.parameters.num_workers = 1  # cores are only reported by a single worker
+        deadline = time.monotonic() + time_limit
+
+        def infeasible(groups, share):
+            model.clear_assumptions()
+            model.AddAssumptions([explainer.groups[g] for g in groups])
+            solver.parameters.max_time_in_seconds = max(0.0, deadline - time.monotonic()) * share
+            return solver.Solve(model) == INFEASIBLE
+
+        if self.cancelled or not infeasible(list(explainer.groups), 0.5):
+            return []
+
+        by_index = {lit.Index(): g for g, lit in explainer.groups.items()}
+        core = [by_index[i] for i in solver.SufficientAssumptionsForInfeasibility()]
+
+        # deletion filter: drop every group the conflict doesn't need
+        candidates = list(core)
+        for k, g in enumerate(candidates):
+            if self.cancelled or time.monotonic() >= deadline:
+                break
+            trial = [c for c in core if c != g]
+            if infeasible(trial, 1 / (len(candidates) - k)):
+                core = trial
+        return core
+
+    # the locked cells of a repair as groups "your edit of <row> week <w>" (explain mode),
+    # or the edits that can't be kept whatever else changes
+    def guard_edits(self, schedule, locked):
+        impossible = []
+        for w, i in locked:
+            group = f"your edit of {i} week {w}"
+            if w not in self.T:
+                impossible.append(f"Week {w} isn't part of the schedule")
+            elif i == 'Leader':
+                leader = schedule.get(w, {}).get('Leader')
+                if not leader:
+                    continue
+                if (leader, w) not in self.leader_assignments:
+                    impossible.append(f"{leader} can't lead week {w}")
+                else:
+                    self.guard(self.model.Add(self.leader_assignments[(leader, w)] == 1), group)
+            else:
+                people = schedule.get(w, {}).get(i, [])
+                impossible += [f"{p} can't take {i} in week {w}" for p in people if (p, w, i) not in self.schedule]
+                for p in self.P:
+                    if (p, w, i) in self.schedule:
+                        self.guard(self.model.Add(self.schedule[(p, w, i)] == int(p in people)), group)
+        return impossible
 
+    '''
+    Constraint groups for infeasibility explanations
+
+    When self.groups is a dict (explain mode), every hard constraint family is only enforced
+    under an assumption literal named after the family, e.g. "leader coverage week 7".
+    Outside explain mode these helpers add the constraints unchanged.
+    '''
+    def guard(self, ct, group):
+        if self.groups is not None:
+            if group not in self.groups:
+                self.groups[group] = self.model.NewBoolVar(f"assume[{group}]")
+            ct.OnlyEnforceIf(self.groups[group])
+        return ct
 
-        self.set_constraints()
-        self.define_penalities_and_objective()
+    # at_most_one / exactly_one don't support enforcement literals, so use sums in explain mode
+    def at_most_one(self, literals, group):
+        if self.groups is None:
+            return self.model.add_at_most_one(literals)
+        return self.guard(self.model.Add(sum(literals) <= 1), group)
 
+    def exactly_one(self, literals, group):
+        if self.groups is None:
+            return self.model.add_exactly_one(literals)
+        return self.guard(self.model.Add(sum(literals) == 1), group)
 
     '''
     Add Constraints to the model
@@ -82,247 +489,1062 @@ class ScheduleBuilder:
     def set_constraints(self):
         # each person only scheduled on weeks they are available
         # each person only assigned to an instrument they can play
-        for p in self.P:
-            for w in self.T:
-                for i in self.I_all:
-                    self.model.add(self.schedule[(p, w, i)] <= min(self.availability.loc[p, f'w{w}'], self.instruments.loc[p, i]))
+        # (implicit in sparse mode, infeasible triples have no variable)
+        with self.profile.family("availability and capability", self.model):
+            if not self.sparse:
+                feasible = self.roster.feasible
+                for (p, w, i), x in self.schedule.items():
+                    r = self.roster
+                    self.model.add(x <= int(feasible[r.person_index[p], r.week_index[w], r.instrument_index[i]]))
                 
         # at most one instrument (excluding vocals) per person
-        for w in self.T:
+        with self.profile.family("one instrument per person", self.model):
             for p in self.P:
-                self.model.add_at_most_one(self.schedule[(p,w,i)] for i in self.I_no_vox)
+                with self.owned_by(p):
+                    self.one_instrument_constraints(p)
 
         # TODO: keyboard and guitarists may also sing (if they can)
-        I_cannot_sing = ["cajon", "strings", "vocals"]
-        for w in self.T:
+        with self.profile.family("no singing with cajon/strings", self.model):
             for p in self.P:
-                self.model.add_at_most_one(self.schedule[(p,w,i)] for i in I_cannot_sing)
-
-        # meet instrument requirements: 1-2 guitartists, 1 keys every week, 3 vocalists every week
-        for w in self.T:
-            # Guitar: allow 1-2 people
-            self.model.Add(sum(self.schedule[(p, w, "acoustic_guitar")] for p in self.P) == 1)
-            # self.model.Add(sum(self.schedule[(p, w, "Guitar")] for p in self.P) <= 2)
-            # Keys: exactly 1
-            self.model.add_exactly_one(self.schedule[(p, w, "piano")] for p in self.P)
-            # Vocals: exactly 3
-            self.model.Add(sum(self.schedule[(p, w, "vocals")] for p in self.P) == 3)
+                with self.owned_by(p):
+                    self.no_singing_constraints(p)
 
-            # Optional Instruments
-            self.model.Add(sum(self.schedule[(p, w, "strings")] for p in self.P) <= 1)
-            self.model.Add(sum(self.schedule[(p, w, "cajon")] for p in self.P) <= 1)
-            self.model.Add(sum(self.schedule[(p, w, "electric_guitar")] for p in self.P) <= 1)
+        # meet instrument requirements (instrument_counts): 1 guitarist, 1 keys, 3 vocalists every week
+        with self.profile.family("instrument coverage", self.model):
+            for w in self.T:
+                for i, (lo, hi) in instrument_counts.items():
+                    players = self.assigned(w, i)
+                    group = f"{i.replace('_', ' ')} coverage week {w}"
+                    if (lo, hi) == (1, 1):
+                        ct = self.exactly_one(players, group)
+                    elif lo == 0:
+                        # optional instruments, never part of an explanation
+                        ct = self.model.Add(sum(players) <= hi)
+                    else:
+                        ct = self.guard(self.model.add_linear_constraint(sum(players), lo, hi), group)
+                    self.track_week_constraint((w, i), ct)
 
 
         # 1 leader every week. Leader should be singing.
-        for w in self.T:
-            self.model.add_exactly_one(self.leader_assignments[(p,w)] for p in self.leaders)
+        with self.profile.family("leader coverage", self.model):
+            for w in self.T:
+                self.track_week_constraint((w, 'Leader'), self.exactly_one(self.leaders_in_week(w), f"leader coverage week {w}"))
             # Leader must be scheduled to sing
             for p in self.leaders:
-                self.model.AddImplication(self.leader_assignments[(p, w)], self.schedule[(p, w, "vocals")])
-            
-                # TODO: handle both case
-                if (self.instruments.loc[p, 'acoustic_guitar']):
-                    self.model.AddImplication(self.leader_assignments[(p, w)], self.schedule[(p, w, "acoustic_guitar")])
-                elif (self.instruments.loc[p, 'piano']):
-                    self.model.AddImplication(self.leader_assignments[(p, w)], self.schedule[(p, w, "piano")])
-
-        # every leader scheduled around twice
-        for l in self.leaders:
-            self.model.Add(sum(self.leader_assignments[(l, w)] for w in self.T) <= 2)
-            self.model.Add(sum(self.leader_assignments[(l, w)] for w in self.T) >= 1)
+                with self.owned_by(p):
+                    self.leader_plays_constraints(p)
+
+        # every leader scheduled around twice (per quarter)
+        with self.profile.family("leader rotation bounds", self.model):
+            for l in self.leaders:
+                with self.owned_by(l):
+                    self.leader_rotation_constraints(l)
 
         # add a variable to easily track if a person is scheduled in week i or not
-        for p in self.P:
-            for w in self.T:
-                self.scheduled_pw[(p, w)] = self.model.NewBoolVar(
-                    f"scheduled_{p}_{w}"
-                )
+        with self.profile.family("scheduled indicators", self.model):
+            for p in self.P:
+                with self.owned_by(p):
+                    self.scheduled_indicators(p)
 
-                self.model.AddMaxEquality(
-                    self.scheduled_pw[(p, w)],
-                    [self.schedule[(p, w, i)] for i in self.I_all]
-                )
+    '''
+    Constraints of set_constraints that only involve person p, one family each
+    '''
+    def one_instrument_constraints(self, p):
+        for w in self.T:
+            insts = self.person_week(p, w, self.I_no_vox)
+            if len(insts) > 1:
+                self.at_most_one(insts, f"one instrument per person week {w}")
 
-    def define_penalities_and_objective(self):
-        self.freq_penalties = {}
+    def no_singing_constraints(self, p):
+        for w in self.T:
+            insts = self.person_week(p, w, no_singing_with + ["vocals"])
+            if len(insts) > 1:
+                self.at_most_one(insts, f"no singing with cajon/strings week {w}")
+
+    def leader_plays_constraints(self, p):
+        for w in self.T:
+            if (p, w) not in self.leader_assignments:
+                continue
+            group = f"leader sings and plays week {w}"
+            self.guard(self.model.AddImplication(self.leader_assignments[(p, w)], self.schedule[(p, w, "vocals")]), group)
+
+            # TODO: handle both case
+            seat = next((i for i in lead_instruments if self.roster.plays(p, i)), None)
+            if seat is not None:
+                self.guard(self.model.AddImplication(self.leader_assignments[(p, w)], self.schedule[(p, w, seat)]), group)
+
+    def leader_rotation_constraints(self, l):
+        lo, hi = self.leader_bounds[l]
+        self.guard(self.model.Add(sum(self.weeks_leading(l)) <= hi), f"leader ≤{hi} cap")
+        self.guard(self.model.Add(sum(self.weeks_leading(l)) >= lo), f"leader ≥{lo} minimum")
+
+    def scheduled_indicators(self, p):
+        for w in self.T:
+            insts = self.person_week(p, w, self.I_all)
+            if not insts:
+                continue
 
-        for p in self.P:
-            desired_num = int(self.frequencies.loc[p, "num_weeks"])
+            self.scheduled_pw[(p, w)] = self.model.NewBoolVar(
+                f"scheduled_{p}_{w}"
+            )
 
-            num_times_scheduled = sum(
-                self.scheduled_pw[(p, w)] for w in self.T
+            self.model.AddMaxEquality(
+                self.scheduled_pw[(p, w)],
+                insts
             )
 
-            deviation = self.model.NewIntVar(0, len(self.T), f"deviation_{p}")
+    def define_penalities_and_objective(self):
+        with self.profile.family("frequency deviation", self.model):
+            self.freq_penalties = {}
+            for p, desired_num in zip(self.P, self.targets.tolist()):
+                with self.owned_by(p):
+                    self.frequency_penalty(p, desired_num)
 
-            # deviation >= |desired_num - num_times_scheduled|
-            self.model.Add(deviation >= desired_num - num_times_scheduled)
-            self.model.Add(deviation >= num_times_scheduled - desired_num) 
+        with self.profile.family("leader gap penalties", self.model):
+            # map from leader -> list of penalties
+            self.leader_penalties = {}
+            # spread out leaders - ideally leader gap is at least 3 or 4
+            for l in self.leaders:
+                with self.owned_by(l):
+                    self.leader_gap_penalties(l)
 
-            self.freq_penalties[p] = deviation
+        with self.profile.family("spacing penalties", self.model):
+            self.spacing_penalties = {}
+            for p, spacing in zip(self.P, self.spacing.tolist()):
+                with self.owned_by(p):
+                    self.spacing_penalty(p, spacing)
 
-        # map from leader -> list of penalties
-        self.leader_penalties = {}
-        # spread out leaders - ideally leader gap is at least 3 or 4
-        lead_gap = 3
-        for l in self.leaders:
-            for w in range(len(self.T) - lead_gap):
-                for d in range(1, lead_gap):
-                    # Auxiliary BoolVar = 1 if leader to lead both week w and week w + desired_gap
-                    freq_violation = self.model.NewBoolVar(f"leader_violation_{l}_{w}_{w + d}")
-                    
-                    # Check if person is leading in week w and w + gap
-                    scheduled_w = self.leader_assignments[(l, self.T[w])]
-                    scheduled_gap = self.leader_assignments[(l, self.T[w + d])] 
-                    
-                    # Penalty: freq_violation = 1 if both weeks are scheduled
-                    self.model.Add(freq_violation >= scheduled_w + scheduled_gap - 1)
-                    self.leader_penalties.setdefault(l, []).append(freq_violation)
-
-
-        self.spacing_penalties = {}
-        for p in self.P:
-            desired_gap = self.frequencies.loc[p, "spacing"] + 1 # desired spacing in weeks
-            for w in range(len(self.T)):
-                for d in range(1, desired_gap):
-                    if w + d >= len(self.T):
-                        continue
-
-                    freq_violation = self.model.NewBoolVar(f"freq_violation_{p}_{w}_{w+d}")
-
-                    self.model.Add(
-                        freq_violation >= self.scheduled_pw[(p, self.T[w])] + self.scheduled_pw[(p, self.T[w + d])] - 1
+        with self.profile.family("optional instrument rewards", self.model):
+            self.optional_rewards = []
+
+            for w in self.T:
+                for i in optional_instruments:
+                    # number of people playing optional instrument i in week w
+                    optional_instr_count = self.model.NewIntVar(
+                        0, len(self.P), f"opt_count_{i}_week{w}"
+                    )
+
+                    ct = self.model.Add(
+                        optional_instr_count == sum(self.assigned(w, i))
                     )
+                    # players enter with the opposite sign of the count
+                    linear = self.model.Proto().constraints[ct.Index()].linear
+                    coeff = -dict(zip(linear.vars, linear.coeffs))[optional_instr_count.Index()]
+                    self.week_constraints.setdefault((w, i), []).append((ct.Index(), coeff))
+
+                    self.optional_rewards.append(optional_instr_count)
 
-                    self.spacing_penalties.setdefault(p, []).append(freq_violation)
+        freq_weight = objective_weights["frequency"]
+        space_weight = objective_weights["spacing"]
+        lead_weight = objective_weights["leader gap"]
+        optional_weight = objective_weights["optional"]
 
-        optional_instr = ["electric_guitar", "strings", "cajon"]
-        self.optional_rewards = []
+        self.objective = (
+            freq_weight * sum(self.freq_penalties.values()) 
+            + space_weight * sum(sum(self.spacing_penalties.get(p, [])) for p in self.P) 
+            + lead_weight * sum(sum(self.leader_penalties.get(l, [])) for l in self.leaders)
+            - optional_weight * sum(self.optional_rewards)
+        )
+        self.model.Minimize(self.objective)
+
+    '''
+    Penalty terms of define_penalities_and_objective for person p, stored in freq_penalties,
+    leader_penalties and spacing_penalties
+    '''
+    def frequency_penalty(self, p, desired_num):
+        num_times_scheduled = sum(
+            self.scheduled_pw[(p, w)] for w in self.T if (p, w) in self.scheduled_pw
+        )
+
+        deviation = self.model.NewIntVar(0, max(len(self.T), desired_num), f"deviation_{p}")
+
+        # deviation >= |desired_num - num_times_scheduled|
+        self.model.Add(deviation >= desired_num - num_times_scheduled)
+        self.model.Add(deviation >= num_times_scheduled - desired_num) 
+
+        self.freq_penalties[p] = deviation
+
+    def leader_gap_penalties(self, l):
+        # pairs of weeks (w, w + d) that the leader should not both lead
+        pairs = []
+        for w in range(len(self.T) - lead_gap):
+            for d in range(1, lead_gap):
+                if (l, self.T[w]) not in self.leader_assignments or (l, self.T[w + d]) not in self.leader_assignments:
+                    continue
+                pairs.append((w, w + d))
+
+        leading = {w: self.leader_assignments[(l, self.T[w])] for w in range(len(self.T)) if (l, self.T[w]) in self.leader_assignments}
+        if pairs:
+            self.leader_penalties[l] = self.penalize_pairs(f"leader_violation_{l}", leading, pairs)
+
+    def spacing_penalty(self, p, spacing):
+        desired_gap = spacing + 1 # desired spacing in weeks
+
+        # pairs of weeks (w, w + d) closer than the desired spacing
+        pairs = []
+        for w in range(len(self.T)):
+            for d in range(1, desired_gap):
+                if w + d >= len(self.T):
+                    continue
+                if (p, self.T[w]) not in self.scheduled_pw or (p, self.T[w + d]) not in self.scheduled_pw:
+                    continue
+                pairs.append((w, w + d))
+
+        scheduled = {w: self.scheduled_pw[(p, self.T[w])] for w in range(len(self.T)) if (p, self.T[w]) in self.scheduled_pw}
+        if pairs:
+            self.spacing_penalties[p] = self.penalize_pairs(f"freq_violation_{p}", scheduled, pairs)
+
+    '''
+    Incremental roster changes
+
+    A built model can take roster changes without a rebuild: remove_person fixes the
+    person's variables to 0 and empties the constraints only they appear in, add_person
+    creates their variables and constraints and adds them to the per-week coverage and
+    optional count constraints and to the objective. update_roster applies the difference
+    to a new team_availability table and hints the next solve with the last schedule.
+    Only sparse models outside explain mode can be changed in place; add_person and
+    remove_person raise ValueError otherwise, and update_roster rebuilds.
+    '''
+    @contextmanager
+    def owned_by(self, p):
+        proto = self.model.Proto()
+        first_var, first_ct = len(proto.variables), len(proto.constraints)
+        yield
+        self.owned.setdefault(p, []).append((first_var, len(proto.variables), first_ct, len(proto.constraints)))
+
+    # remember a per-week constraint that new assignment variables of `cell` must join
+    def track_week_constraint(self, cell, ct):
+        self.week_constraints.setdefault(cell, []).append((ct.Index(), 1))
+
+    def check_incremental(self):
+        if not self.sparse or self.groups is not None:
+            raise ValueError("Only sparse models outside explain mode can be changed in place")
+
+    def remove_person(self, p):
+        self.check_incremental()
+        if p not in self.roster.person_index:
+            raise ValueError(f"{p} is not on the roster")
+        proto = self.model.Proto()
+        k = self.roster.person_index[p]
+
+        # empty constraints no longer restrict anything, fixed variables keep every index valid
+        dead = self.x_index[k][self.x_index[k] >= 0].tolist() + self.leader_index[k][self.leader_index[k] >= 0].tolist()
+        for first_var, end_var, first_ct, end_ct in self.owned.pop(p, []):
+            for c in range(first_ct, end_ct):
+                ct = proto.constraints[c]
+                ct.copy_from(type(ct)())
+            dead += range(first_var, end_var)
+        for v in dead:
+            domain = proto.variables[v].domain
+            domain.clear()
+            domain.extend([0, 0])
+        self.dead_variables += len(dead)
 
         for w in self.T:
-            for i in optional_instr:
-                # number of people playing optional instrument i in week w
-                optional_instr_count = self.model.NewIntVar(
-                    0, len(self.P), f"opt_count_{i}_week{w}"
-                )
+            for i in self.I_all:
+                self.schedule.pop((p, w, i), None)
+            self.leader_assignments.pop((p, w), None)
+            self.scheduled_pw.pop((p, w), None)
+        for table in (self.freq_penalties, self.spacing_penalties, self.leader_penalties, self.leader_bounds):
+            table.pop(p, None)
 
-                self.model.Add(
-                    optional_instr_count == sum(self.schedule[(p, w, i)] for p in self.P)
-                )
+        rows = [j for j in range(len(self.P)) if j != k]
+        self.x_index = self.x_index[rows]
+        self.leader_index = self.leader_index[rows]
+        self.targets = self.targets[rows]
+        self.set_roster(self.roster.select_people(rows))
+
+    '''
+    Add one person, given as a team_availability row (dict or Series) or a one-person
+    Roster with the same weeks, to the built model.
+    '''
+    def add_person(self, row):
+        self.check_incremental()
+        person = row if isinstance(row, Roster) else Roster.from_dataframe(pd.DataFrame([row]), self.T)
+        p = person.names[0]
+        if p in self.roster.person_index:
+            raise ValueError(f"{p} is already on the roster")
 
-                self.optional_rewards.append(optional_instr_count)
+        feasible = person.feasible[0]
+        can_lead = person.can_lead[0]
+        cells = [(self.T[t], self.I_all[j]) for t, j in zip(*np.nonzero(feasible))] + [(self.T[t], 'Leader') for t in np.flatnonzero(can_lead)]
+        proto = self.model.Proto()
+        for cell in cells:
+            for c, _ in self.week_constraints.get(cell, []):
+                ct = proto.constraints[c]
+                if not (ct.has_linear() or ct.has_exactly_one()):
+                    # e.g. a week nobody could cover, whose constraint was simplified away
+                    raise ValueError(f"Week {cell[0]} {cell[1]} can't take new people, rebuild the model")
 
-        freq_weight = 2
-        space_weight = 3
-        lead_weight = 1 
-        optional_weight = 1
+        self.set_roster(self.roster.append(person))
+        k = len(self.P) - 1
+        self.targets = np.append(self.targets, int(np.rint(person.num_weeks[0] * len(self.T) / weeks_per_quarter)))
+        if person.is_leader[0]:
+            self.leader_bounds[p] = self.default_leader_bounds()
 
-        self.model.Minimize(
-            freq_weight * sum(self.freq_penalties.values()) 
-            + space_weight * sum(sum(self.spacing_penalties[p]) for p in self.P) 
-            + lead_weight * sum(sum(self.leader_penalties[l]) for l in self.leaders)
-            - optional_weight * sum(self.optional_rewards)
+        x_row = np.full((1, len(self.T), len(self.I_all)), -1)
+        for t, j in zip(*np.nonzero(feasible)):
+            w, i = self.T[t], self.I_all[j]
+            self.schedule[(p, w, i)] = self.model.new_bool_var(f"x_{p},week{w},{i}")
+            x_row[0, t, j] = self.schedule[(p, w, i)].Index()
+            self.join_week_constraints((w, i), x_row[0, t, j])
+        lead_row = np.full((1, len(self.T)), -1)
+        for t in np.flatnonzero(can_lead):
+            w = self.T[t]
+            self.leader_assignments[(p, w)] = self.model.new_bool_var(f"l_{p},{w}")
+            lead_row[0, t] = self.leader_assignments[(p, w)].Index()
+            self.join_week_constraints((w, 'Leader'), lead_row[0, t])
+        self.x_index = np.concatenate([self.x_index, x_row])
+        self.leader_index = np.concatenate([self.leader_index, lead_row])
+
+        with self.owned_by(p):
+            self.one_instrument_constraints(p)
+            self.no_singing_constraints(p)
+            if p in self.leader_bounds:
+                self.leader_plays_constraints(p)
+                self.leader_rotation_constraints(p)
+            self.scheduled_indicators(p)
+            self.frequency_penalty(p, int(self.targets[k]))
+            self.spacing_penalty(p, int(self.spacing[k]))
+            if p in self.leader_bounds:
+                self.leader_gap_penalties(p)
+
+        terms = (
+            [(self.freq_penalties[p], objective_weights["frequency"])]
+            + [(v, objective_weights["spacing"]) for v in self.spacing_penalties.get(p, [])]
+            + [(v, objective_weights["leader gap"]) for v in self.leader_penalties.get(p, [])]
         )
+        objective = proto.objective
+        objective.vars.extend([v.Index() for v, _ in terms])
+        objective.coeffs.extend([c for _, c in terms])
+        self.objective = self.objective + sum(c * v for v, c in terms)
+
+    def join_week_constraints(self, cell, var):
+        constraints = self.model.Proto().constraints
+        for c, coeff in self.week_constraints.get(cell, []):
+            ct = constraints[c]
+            if ct.has_exactly_one():
+                ct.exactly_one.literals.append(int(var))
+            else:
+                ct.linear.vars.append(int(var))
+                ct.linear.coeffs.append(coeff)
+
+    def update_person(self, row):
+        self.remove_person(row.names[0] if isinstance(row, Roster) else row["name"])
+        self.add_person(row)
+
+    def set_roster(self, roster):
+        self.roster = self.data = roster
+        self.P = roster.names
+        self.leaders = roster.leaders
+        self.spacing = roster.spacing
 
     '''
-    Return a list of n solutions
+    Bring the built model in line with `data`: people who left are removed, new people added
+    and people whose answers changed are replaced. Falls back to a full rebuild when the
+    weeks changed, more than max_changes people (default a quarter of the roster) changed,
+    the model can't be changed in place, or removed people's variables make up half of it.
+    The next solve is hinted with the last schedule found. Returns True if the model was
+    changed in place.
+    '''
+    def update_roster(self, data, max_changes=None):
+        new = Roster.from_dataframe(data)
+        old = self.roster
+        removed = [p for p in old.names if p not in new.person_index]
+        added = [p for p in new.names if p not in old.person_index]
+        kept = [p for p in new.names if p in old.person_index]
+        a = [old.person_index[p] for p in kept]
+        b = [new.person_index[p] for p in kept]
+        differs = (
+            (old.availability[a] != new.availability[b]).any(axis=1)
+            | (old.capability[a] != new.capability[b]).any(axis=1)
+            | (old.is_leader[a] != new.is_leader[b])
+            | (old.num_weeks[a] != new.num_weeks[b])
+        ) if kept and new.weeks == self.T else []
+        changed = [p for p, d in zip(kept, differs) if d]
+
+        max_changes = max(1, len(old) // 4) if max_changes is None else max_changes
+        in_place = (
+            new.weeks == self.T and self.sparse and self.groups is None
+            and len(removed) + len(added) + len(changed) <= max_changes
+        )
+        if in_place:
+            try:
+                with self.profile.phase("roster update"):
+                    for p in removed:
+                        self.remove_person(p)
+                    for p in changed:
+                        self.update_person(new.select_people([new.person_index[p]]))
+                    for p in added:
+                        self.add_person(new.select_people([new.person_index[p]]))
+            except ValueError:
+                in_place = False
+        in_place = in_place and self.dead_variables * 2 < len(self.model.Proto().variables)
+
+        self.data = data
+        if in_place:
+            self.set_search_model()
+        else:
+            self.parse_data()
+            self.build_model(self.sparse, self.penalty_encoding, self.symmetry_breaking)
+        self.hint_incumbent()
+        return in_place
+
+    '''
+    Hint the x and leader variables with the last schedule read (read_solution), for
+    everyone who was on the roster then; new people are hinted 0
+    '''
+    def hint_incumbent(self):
+        if self.incumbent is None or self.incumbent[1] != self.T:
+            return
+        names, _, x, lead = self.incumbent
+        before = {p: k for k, p in enumerate(names)}
+        rows = [(k, before[p]) for k, p in enumerate(self.P) if p in before]
+        x_hint = np.zeros(self.x_index.shape, dtype=int)
+        lead_hint = np.zeros(self.leader_index.shape, dtype=int)
+        if rows:
+            now, then = map(list, zip(*rows))
+            x_hint[now] = x[then]
+            lead_hint[now] = lead[then]
+
+        has_x, has_lead = self.x_index >= 0, self.leader_index >= 0
+        variables = np.concatenate([self.x_index[has_x], self.leader_index[has_lead]]).tolist()
+        values = np.concatenate([x_hint[has_x], lead_hint[has_lead]]).tolist()
+        for model in {id(m): m for m in (self.model, self.search_model)}.values():
+            model.clear_hints()
+            hint = model.Proto().solution_hint
+            hint.vars.extend(variables)
+            hint.values.extend(values)
+
+    '''
+    Groups of interchangeable people: same availability, instruments, leader flag, frequency
+    target, spacing and leader bounds. Swapping two people of a group turns any schedule
+    into another one with the same objective. Returns lists of person indices, only groups
+    of two or more.
+    '''
+    def symmetry_classes(self):
+        r = self.roster
+        bounds = np.array([self.leader_bounds.get(p, (0, 0)) for p in self.P], dtype=int).reshape(len(self.P), 2)
+        profiles = np.column_stack([
+            r.availability, r.capability, r.is_leader, self.targets, self.spacing, bounds,
+        ]).astype(int)
+        if not len(profiles):
+            return []
+        _, inverse, counts = np.unique(profiles, axis=0, return_inverse=True, return_counts=True)
+        return [np.flatnonzero(inverse == c).tolist() for c in np.flatnonzero(counts > 1)]
+
+    '''
+    Add symmetry-breaking constraints to `model`: within each group of symmetry_classes,
+    the weeks people are scheduled, read as a binary number (earliest week most
+    significant), must not increase from one person to the next. Any schedule can be put in
+    that order by swapping people within groups, so the optimal objective is unchanged.
+    Only the first max_weeks available weeks are compared, to keep coefficients small.
+    Returns the number of constraints added.
+    '''
+    def break_symmetry(self, model, max_weeks=30):
+        added = 0
+        with self.profile.family("symmetry breaking", model):
+            for group in self.symmetry_classes():
+                # identical availability, so every member has the same scheduled weeks
+                weeks = [w for w in self.T if (self.P[group[0]], w) in self.scheduled_pw][:max_weeks]
+                if not weeks:
+                    continue
+                rank = [
+                    sum(2 ** (len(weeks) - 1 - t) * self.scheduled_pw[(self.P[k], w)] for t, w in enumerate(weeks))
+                    for k in group
+                ]
+                for a, b in zip(rank, rank[1:]):
+                    model.Add(a >= b)
+                    added += 1
+        return added
+
+    '''
+    Penalty terms counting the pairs (a, b) of week indices where both indicators are 1.
+
+    "pairwise": one BoolVar per pair, violation >= x[a] + x[b] - 1.
+    "window":   one IntVar per later week b, counting the earlier weeks of its pairs that are
+                also scheduled, only when b itself is: v_b >= sum(x[a]) - |a's| * (1 - x[b]).
+    Both give the same minimum total, the window form just needs far fewer variables.
+    The terms are added to `model` (default: the builder's model).
+    '''
+    def penalize_pairs(self, name, indicators, pairs, model=None):
+        model = self.model if model is None else model
+        penalties = []
+        if self.penalty_encoding == "window":
+            earlier = {}
+            for a, b in pairs:
+                earlier.setdefault(b, []).append(a)
+
+            for b, weeks in earlier.items():
+                violations = model.NewIntVar(0, len(weeks), f"{name}_window_{b}")
+                model.Add(
+                    violations >= sum(indicators[a] for a in weeks) - len(weeks) * (1 - indicators[b])
+                )
+                penalties.append(violations)
+            return penalties
+
+        for a, b in pairs:
+            # Auxiliary BoolVar = 1 if both weeks are scheduled
+            violation = model.NewBoolVar(f"{name}_{a}_{b}")
+            model.Add(violation >= indicators[a] + indicators[b] - 1)
+            penalties.append(violation)
+        return penalties
+
+    '''
+    Return a list of up to n solutions, one per random seed. With the default solve profile,
+    schedules that are feasible but not proven optimal are kept too.
     '''
     def get_solutions(self, n = 1) -> list:
-        self.solver = CpSolver()
+        self.solver = self.new_solver()
+        self.start_budget()
     
         solutions = []
         for seed in range(n):  # number of schedules you want
             self.solver.parameters.random_seed = seed
-            status = self.solver.Solve(self.model)
-
-            if status == 4:  # optimal
-                sol = {}
-                for w in self.T:
-                    sol[w] = {}
-                    for i in self.I_all:
-                        sol[w][i] = [
-                            p for p in self.P
-                            if self.solver.Value(self.schedule[(p, w, i)]) == 1
-                        ]
-                    for l in self.leaders:
-                        if self.solver.value(self.leader_assignments[(l, w)]) == 1:
-                            sol[w]['Leader'] = l
-            
-                    
-                diagnostics = self.run_diagnostics()
-                solutions.append((sol, diagnostics))
+            # split what is left of the time budget evenly over the remaining seeds
+            status = self.status = self.solve(self.search_model, f"seed {seed}", share=1 / (n - seed))
+
+            if self.accepted(status):
+                solutions.append(self.read_solution())
                 
         return solutions 
 
+    '''
+    Return up to n distinct near-optimal solutions from a chain of warm-started solves.
+
+    The first solve finds the best schedule. Every following solve is a feasibility search
+    on a copy of the model that:
+        - keeps the objective within `gap` of the best (0.05 = within 5%)
+        - differs from every schedule found so far in at least `min_distance` cells
+        - is hinted with the previous schedule
+    Stops early once no further schedule satisfies these bounds.
+
+    With a SolutionStream, every improving schedule of the first solve is published to it as
+    it is found; stopping the stream ends that search early and the pool is built around the
+    best schedule so far.
+    '''
+    def get_solution_pool(self, n=5, min_distance=1, gap=0.05, time_limit=None, on_progress=None, stream=None) -> list:
+        self.solver = self.new_solver()
+        self.start_budget()
+
+        # on_progress(found, n, objective, seconds) is called for every improving solution
+        # of the first solve and once for every schedule added to the pool
+        def report(found, objective, seconds):
+            if on_progress:
+                on_progress(found, n, objective, seconds)
+
+        if self.cancelled:
+            return []
+
+        callback = ProgressCallback(self, lambda obj, t: report(0, obj, t))
+        if stream is not None:
+            callback = StreamingCallback(self, stream, callback.on_solution)
+            stream.solver = self.solver
+        # leave a third of the time budget for the alternatives
+        self.status = self.solve(self.search_model, "best schedule", callback, time_limit, share=2 / 3 if n > 1 else 1)
+        if stream is not None:
+            stream.close(self.status)
+        if self.cancelled or not self.accepted(self.status):
+            return []
+
+        best = self.solver.ObjectiveValue()
+        solutions = [self.read_solution()]
+        report(1, best, self.solver.WallTime())
+
+        # keep near-optimal: objective <= best + gap * |best|
+        pool_model = self.model.clone()
+        pool_model.clear_objective()
+        pool_model.Add(self.objective <= math.floor(best + gap * abs(best)))
+
+        cells = list(self.schedule.values())
+        cell_index = np.array([x.Index() for x in cells], dtype=int)
+        while len(solutions) < n and not self.cancelled:
+            values = self.solution_values()[cell_index].tolist()
+
+            # Hamming distance to the last schedule: ones turned off + zeros turned on
+            pool_model.Add(
+                sum(1 - x for x, v in zip(cells, values) if v)
+                + sum(x for x, v in zip(cells, values) if not v)
+                >= min_distance
+            )
+
+            pool_model.clear_hints()
+            for x, v in zip(cells, values):
+                pool_model.AddHint(x, v)
+
+            status = self.solve(pool_model, f"pool schedule {len(solutions) + 1}", time_limit=time_limit)
+            if self.cancelled or status not in (OPTIMAL, FEASIBLE):
+                break
+
+            solutions.append(self.read_solution())
+            report(len(solutions), self.solver.Value(self.objective), self.solver.WallTime())
+
+        return solutions
+
+    '''
+    Streaming solve: starts the search in a background thread and returns a SolutionStream
+    that yields every improving schedule as CP-SAT finds it.
+
+        stream = builder.stream_solutions(time_limit=30)
+        for update in stream:
+            show(update["solution"], update["objective"])
+            if good_enough(update):
+                stream.stop()
+    '''
+    def stream_solutions(self, time_limit=None) -> SolutionStream:
+        stream = SolutionStream()
+        self.solver = stream.solver = self.new_solver()
+        self.start_budget()
+
+        def run():
+            status = None
+            try:
+                status = self.status = self.solve(self.search_model, "streamed schedule", StreamingCallback(self, stream), time_limit)
+            finally:
+                stream.close(status)
+
+        stream.thread = threading.Thread(target=run, name="stream-solve", daemon=True)
+        stream.thread.start()
+        return stream
+
+    '''
+    Repair a (possibly edited) schedule instead of solving from scratch.
+
+    `schedule` is in the extract_solution format. Cells listed in `locked` as
+    (week, instrument) or (week, 'Leader') are fixed exactly as given; every other cell is
+    passed to CP-SAT as a hint. The search minimizes the number of cells changed from
+    `schedule`, breaking ties with the usual schedule objective.
+    Returns [(solution, diagnostics)], or [] if the locked cells cannot all be kept.
+    '''
+    def repair(self, schedule, locked=(), time_limit=None, on_progress=None) -> list:
+        self.solver = self.new_solver()
+        self.start_budget()
+        if self.cancelled:
+            return []
+
+        repair_model = self.model.clone()
+        repair_model.clear_hints()
+        if not self.lock_cells(repair_model, schedule, locked):
+            self.status = INFEASIBLE
+            return []
+
+        # hint the current schedule and count every cell that differs from it
+        changes = []
+        for (p, w, i), x in self.schedule.items():
+            v = int(p in schedule.get(w, {}).get(i, []))
+            repair_model.AddHint(x, v)
+            changes.append(1 - x if v else x)
+        for (l, w), x in self.leader_assignments.items():
+            v = int(schedule.get(w, {}).get('Leader') == l)
+            repair_model.AddHint(x, v)
+            changes.append(1 - x if v else x)
+
+        # weight changes above the whole objective range so fewer changes always wins
+        repair_model.Minimize((self.objective_range() + 1) * sum(changes) + self.objective)
+
+        self.status = self.solve(repair_model, "repair", ProgressCallback(self), time_limit)
+        if self.cancelled or not self.accepted(self.status):
+            return []
+
+        if on_progress:
+            on_progress(1, 1, self.solver.Value(self.objective), self.solver.WallTime())
+        return [self.read_solution()]
+
+    '''
+    Rolling-horizon solve for long horizons.
+
+    Solves windows of `window` weeks in sequence and commits the first `step` weeks of each.
+    The last few committed weeks (the longest spacing or leader gap) are carried into the next window as
+    locked cells, so spacing and leader-gap penalties see across the boundary. Frequency
+    targets and leader bounds are reduced by what is already committed and prorated over
+    the remaining weeks. Every window is a small model, so time grows linearly with the
+    horizon. Returns [(solution, diagnostics)] for the whole horizon, or [] if a window fails.
+    '''
+    def solve_rolling(self, window=10, step=5, time_limit=None, sparse=True, penalty_encoding="pairwise", on_progress=None):
+        # enough carried weeks for every spacing and leader gap pair across the boundary
+        context = max(int(self.spacing.max()) if self.P else 0, lead_gap - 1)
+        targets = dict(zip(self.P, self.targets.tolist()))
+        committed = {}
+        self.start_budget()
+
+        def times_scheduled(p, weeks):
+            return sum(any(p in committed[w][i] for i in self.I_all) for w in weeks)
+
+        def times_leading(l, weeks):
+            return sum(committed[w].get('Leader') == l for w in weeks)
+
+        start = 0
+        while start < len(self.T):
+            if self.cancelled:
+                return []
+
+            before = self.T[:start]
+            context_weeks = self.T[max(0, start - context):start]
+            new_weeks = self.T[start:start + window]
+            last = start + len(new_weeks) >= len(self.T)
+            share = len(new_weeks) / (len(self.T) - start)
+
+            window_targets = {
+                p: times_scheduled(p, context_weeks) + round(max(0, targets[p] - times_scheduled(p, before)) * share)
+                for p in self.P
+            }
+            # leader bounds prorated over the remaining weeks, or (if that window turns out
+            # infeasible) only capped by what each leader has left
+            prorated, relaxed = {}, {}
+            for l, (lo, hi) in self.leader_bounds.items():
+                led, carried = times_leading(l, before), times_leading(l, context_weeks)
+                relaxed[l] = (carried + (max(0, lo - led) if last else 0), carried + max(0, hi - led))
+                prorated[l] = relaxed[l] if last else (carried + math.floor(max(0, lo - led) * share), carried + math.ceil(max(0, hi - led) * share))
+
+            for window_bounds in ([prorated] if last else [prorated, relaxed]):
+                with self.profile.phase("window models"):
+                    sub = ScheduleBuilder(self.roster, n=1, weeks=context_weeks + new_weeks, targets=window_targets, leader_bounds=window_bounds)
+                    sub.build_model(sparse=sparse, penalty_encoding=penalty_encoding)
+                    sub.lock_cells(sub.model, committed, [(w, i) for w in context_weeks for i in self.I_all + ['Leader']])
+
+                # the time budget is shared out over the weeks still to plan, by weeks committed
+                budget_share = 1 if last else step / (len(self.T) - start)
+                self.solver = sub.solver = self.new_solver()
+                self.status = self.solve(sub.model, f"weeks {new_weeks[0]}-{new_weeks[-1]}", ProgressCallback(self), time_limit, budget_share)
+                if self.cancelled or self.accepted(self.status):
+                    break
+
+            if self.cancelled or not self.accepted(self.status):
+                return []
+
+            sol = sub.extract_solution()
+            for w in (new_weeks if last else new_weeks[:step]):
+                committed[w] = sol[w]
+            if on_progress:
+                on_progress(len(committed), len(self.T), self.solver.ObjectiveValue(), self.solver.WallTime())
+
+            if last:
+                break
+            start += step
+
+        # evaluate the stitched schedule on the full model (every cell fixed, so presolve solves it)
+        self.build_model(sparse=sparse, penalty_encoding=penalty_encoding)
+        full_model = self.model.clone()
+        self.lock_cells(full_model, committed, [(w, i) for w in self.T for i in self.I_all + ['Leader']])
+        self.solver = self.new_solver()
+        self.deadline = None  # always finish the check, it's only presolve
+        self.status = self.solve(full_model, "full horizon check")
+        if self.status not in (OPTIMAL, FEASIBLE):
+            return []
+        return [self.read_solution()]
+
+    '''
+    Leader-first solve for large rosters, in two stages:
+        1. the leader rotation alone (build_leader_model), a model with one variable per
+           possible (leader, week)
+        2. the full model with those leaders fixed, so only instruments are left to assign
+    If stage 2 finds nothing, the joint model is solved instead. Stage 1 only lets a leader
+    lead weeks where the rest of the band can still be filled, so that is rare.
+
+    The result can be worse than solving everything together. With compare_joint=True the
+    joint model is solved afterwards as well and self.decomposition records how far the
+    schedule is from the joint optimum (gap_to_joint, against the joint model's best bound)
+    and from the joint model's own schedule (joint_difference).
+    Returns [(solution, diagnostics)] or [].
+    '''
+    def solve_decomposed(self, time_limit=None, compare_joint=False, on_progress=None):
+        self.start_budget()
+        self.decomposition = {"leader_objective": None, "objective": None, "fallback": False}
+
+        def report(objective, seconds):
+            if on_progress:
+                on_progress(0, 1, objective, seconds)
+
+        with self.profile.phase("leader model"):
+            leader_model, lead = self.build_leader_model()
+        self.solver = self.new_solver()
+        # the rotation is a small model, a quarter of the budget is plenty
+        status = self.solve(leader_model, "leader rotation", time_limit=time_limit, share=0.25)
+
+        solved = False
+        if not self.cancelled and self.accepted(status):
+            self.decomposition["leader_objective"] = self.solver.ObjectiveValue()
+            rotation = {w: p for (p, w), x in lead.items() if self.solver.Value(x)}
+            fixed = self.model.clone()
+            for (p, w), x in self.leader_assignments.items():
+                fixed.Add(x == int(rotation.get(w) == p))
+
+            self.solver = self.new_solver()
+            self.status = self.solve(fixed, "instruments for fixed leaders", ProgressCallback(self, report), time_limit)
+            solved = self.accepted(self.status)
+
+        if self.cancelled:
+            return []
+        if not solved:
+            self.decomposition["fallback"] = True
+            self.solver = self.new_solver()
+            self.status = self.solve(self.search_model, "joint fallback", ProgressCallback(self, report), time_limit)
+            if self.cancelled or not self.accepted(self.status):
+                return []
+
+        objective = self.decomposition["objective"] = self.solver.ObjectiveValue()
+        solutions = [self.read_solution()]
+        if on_progress:
+            on_progress(1, 1, objective, self.solver.WallTime())
+
+        if compare_joint and not self.decomposition["fallback"]:
+            status = self.status
+            self.solver = self.new_solver()
+            self.deadline = None  # the comparison gets its own time, not what is left of the budget
+            joint = self.solve(self.search_model, "joint comparison", time_limit=time_limit or self.solve_settings["time_limit"])
+            if joint in (OPTIMAL, FEASIBLE):
+                bound = self.solver.BestObjectiveBound()
+                self.decomposition.update(
+                    joint_objective=self.solver.ObjectiveValue(),
+                    joint_bound=bound,
+                    joint_optimal=joint == OPTIMAL,
+                    # negative when the leader-first schedule is the better one
+                    joint_difference=objective - self.solver.ObjectiveValue(),
+                    # at most this far (relative) from the best schedule of the joint model
+                    gap_to_joint=max(0.0, objective - bound) / max(1.0, abs(objective)),
+                )
+            self.status = status
+        return solutions
+
+    '''
+    Stage 1 of solve_decomposed: the leader rotation on its own.
+
+    Keeps the hard leader constraints (one leader a week, rotation bounds) and the parts of
+    the objective that leading alone already decides: leader gap penalties, spacing
+    penalties between weeks the same person leads, and leading more often than someone's
+    frequency target. Leading a week is only allowed when the week can still be staffed
+    around the leader: two other vocalists, and another pianist for a guitar-playing leader
+    (or another guitarist for a piano-playing one).
+    Returns (model, {(leader, week): BoolVar}).
+    '''
+    def build_leader_model(self):
+        r = self.roster
+        col = r.instrument_index
+
+        # P x T x I: how many others could play each instrument that week
+        feasible = r.feasible
+        others = feasible.sum(axis=0) - feasible
+        # the leader sings and plays their lead instrument, everyone else fills the rest
+        seat = lead_instrument(r)
+        allowed = r.can_lead.copy()
+        for i, (lo, _) in instrument_counts.items():
+            if lo > 0:
+                takes = (seat == col[i]) | (i == "vocals")
+                allowed &= others[:, :, col[i]] >= lo - takes[:, None]
+
+        model = CpModel()
+        lead = {}
+        for (p, w) in self.leader_assignments:
+            if allowed[r.person_index[p], r.week_index[w]]:
+                lead[(p, w)] = model.new_bool_var(f"l_{p},{w}")
+
+        for w in self.T:
+            model.add_exactly_one([lead[(p, w)] for p in self.leaders if (p, w) in lead])
+
+        penalties = []
+        for l in self.leaders:
+            weeks = {t: lead[(l, w)] for t, w in enumerate(self.T) if (l, w) in lead}
+            lo, hi = self.leader_bounds[l]
+            model.Add(sum(weeks.values()) <= hi)
+            model.Add(sum(weeks.values()) >= lo)
+
+            k = r.person_index[l]
+            gap_pairs = [(t, t + d) for t in range(len(self.T) - lead_gap) for d in range(1, lead_gap) if t in weeks and t + d in weeks]
+            spacing_pairs = [(t, t + d) for t in weeks for d in range(1, int(self.spacing[k]) + 1) if t + d in weeks]
+            if gap_pairs:
+                penalties += [objective_weights["leader gap"] * v for v in self.penalize_pairs(f"leader_violation_{l}", weeks, gap_pairs, model)]
+            if spacing_pairs:
+                penalties += [objective_weights["spacing"] * v for v in self.penalize_pairs(f"freq_violation_{l}", weeks, spacing_pairs, model)]
+
+            # leading counts towards the frequency target, going over it can't be undone later
+            over = model.NewIntVar(0, len(self.T), f"over_target_{l}")
+            model.Add(over >= sum(weeks.values()) - int(self.targets[k]))
+            penalties.append(objective_weights["frequency"] * over)
+
+        model.Minimize(sum(penalties))
+        return model, lead
+
+    '''
+    Solver settings for every solve of this builder:
+        workers          parallel CP-SAT search workers, 0 for one per core
+        time_limit       wall-clock budget in seconds for a whole get_solutions,
+                         get_solution_pool, repair or solve_rolling call (None: no limit)
+        relative_gap     stop as soon as the schedule is proven within this fraction of the best
+        accept_feasible  keep the best schedule found when the budget runs out, even though it
+                         isn't proven optimal
+        max_memory_mb    CP-SAT stops searching (keeping its best schedule) above this memory use
+        log_search       capture the CP-SAT search log, which splits each solve's time into
+                         presolve and search in the profile (adds logging overhead)
+    Time limits passed to the solve methods still cap each individual solve.
+    '''
+    def set_solve_profile(self, workers=0, time_limit=None, relative_gap=0.0, accept_feasible=True, max_memory_mb=None,
+                          log_search=False):
+        self.solve_settings = {
+            "workers": workers,
+            "time_limit": time_limit,
+            "relative_gap": relative_gap,
+            "accept_feasible": accept_feasible,
+            "max_memory_mb": max_memory_mb,
+            "log_search": log_search,
+        }
+
+    def accepted(self, status):
+        return status == OPTIMAL or (status == FEASIBLE and self.solve_settings["accept_feasible"])
+
+    # start the clock on the time budget of one solve call
+    def start_budget(self):
+        budget = self.solve_settings["time_limit"]
+        self.deadline = time.monotonic() + budget if budget else None
+
+    '''
+    New CP-SAT solver with the solve profile applied, capturing the search log (so solve()
+    can split presolve and search time) only when log_search is set
+    '''
+    def new_solver(self):
+        solver = CpSolver()
+        solver.parameters.num_workers = self.solve_settings["workers"]
+        solver.parameters.relative_gap_limit = self.solve_settings["relative_gap"]
+        if self.solve_settings["max_memory_mb"]:
+            solver.parameters.max_memory_in_mb = self.solve_settings["max_memory_mb"]
+        if self.solve_settings["log_search"]:
+            solver.parameters.log_search_progress = True
+            solver.parameters.log_to_stdout = False
+            solver.log_callback = self.solver_log.append
+        return solver
+
+    '''
+    Solve `model` with self.solver and record the solver statistics in the profile under `label`.
+    The solve gets at most `time_limit` seconds and `share` of what is left of the time budget.
+    '''
+    def solve(self, model, label, callback=None, time_limit=None, share=1.0):
+        limits = [time_limit] if time_limit else []
+        if self.deadline is not None:
+            limits.append(max(0.0, self.deadline - time.monotonic()) * share)
+        if limits:
+            self.solver.parameters.max_time_in_seconds = min(limits)
+
+        self.solver_log.clear()
+        status = self.solver.Solve(model, callback)
+        self.profile.record_solve(label, self.solver, status, self.solver_log, model.has_objective())
+        return status
+
+    '''
+    Fix the given cells of `schedule` in `model`. Returns False when a locked assignment
+    is impossible (the person is unavailable, can't play the instrument, or can't lead).
+    '''
+    def lock_cells(self, model, schedule, locked):
+        for w, i in locked:
+            if w not in self.T:
+                return False
+            if i == 'Leader':
+                leader = schedule.get(w, {}).get('Leader')
+                if not leader:
+                    continue
+                if (leader, w) not in self.leader_assignments:
+                    return False
+                model.Add(self.leader_assignments[(leader, w)] == 1)
+                continue
+
+            people = schedule.get(w, {}).get(i, [])
+            if any((p, w, i) not in self.schedule for p in people):
+                return False
+            for p in self.P:
+                if (p, w, i) in self.schedule:
+                    model.Add(self.schedule[(p, w, i)] == int(p in people))
+        return True
+
+    '''
+    Difference between the largest and smallest value the objective can take
+    '''
+    def objective_range(self):
+        proto = self.model.Proto()
+        total = 0
+        for v, c in zip(proto.objective.vars, proto.objective.coeffs):
+            domain = list(proto.variables[v if v >= 0 else -v - 1].domain)
+            total += abs(c) * (domain[-1] - domain[0])
+        return total
+
+    '''
+    Stop any running or upcoming solve. Safe to call from another thread.
+    '''
+    def cancel(self):
+        self.cancelled = True
+        if self.solver is not None:
+            self.solver.StopSearch()
+
+    '''
+    All variable values of the last solve in one call, indexed like the model's variables
+    '''
+    def solution_values(self):
+        return np.array(self.solver.ResponseProto().solution, dtype=np.int64)
+
+    '''
+    The last solve as arrays: assignments (P x T x I) and leaders (P x T), both bool
+    '''
+    def solution_arrays(self, values=None):
+        values = self.solution_values() if values is None else values
+        x = (self.x_index >= 0) & (values[self.x_index] == 1)
+        lead = (self.leader_index >= 0) & (values[self.leader_index] == 1)
+        return x, lead
+
+    '''
+    (solution, diagnostics) for the last solve, reading the solver's values once
+    '''
+    def read_solution(self):
+        with self.profile.phase("extraction"):
+            arrays = self.solution_arrays()
+            self.incumbent = (list(self.P), list(self.T), *arrays)
+            return self.extract_solution(arrays), self.run_diagnostics(arrays)
+
+    '''
+    Read the current solver solution into {week: {instrument: [people], 'Leader': leader}}
+    '''
+    def extract_solution(self, arrays=None):
+        x, lead = self.solution_arrays() if arrays is None else arrays
+
+        sol = {w: {i: [] for i in self.I_all} for w in self.T}
+        for k, t, j in zip(*np.nonzero(x)):
+            sol[self.T[t]][self.I_all[j]].append(self.P[k])
+        for k, t in zip(*np.nonzero(lead)):
+            sol[self.T[t]]['Leader'] = self.P[k]
+
+        return sol
+
     '''
     Given a solution, return diagnostics per person:
         {
             Person: NumWeeksTotal, NumTimesLeading, [list of weeks scheduled], [instruments each time], 
         }
-    Also, return the list of penalties
+    Frequency deviation and spacing violations are counted from the schedule itself rather than
+    the penalty variables, which are only tight when the objective is being minimized (not in
+    solution pool searches).
     '''
-    def run_diagnostics(self):
-        # for each person, count the number of weeks scheduled
-        diagnostics = {}
-
-        for p in self.P:
-            weeks_scheduled = []
-            weeks_leading = []
-            assignments = {}
+    def run_diagnostics(self, arrays=None):
+        x, lead = self.solution_arrays() if arrays is None else arrays
+        scheduled = x.any(axis=2)  # P x T
 
-            for w in self.T:
-                insts = [
-                    i for i in self.I_all
-                    if self.solver.Value(self.schedule[(p, w, i)]) == 1
-                ]
+        total_weeks = scheduled.sum(axis=1)
+        counts = penalty_counts(x[None], lead[None], self.targets, self.spacing, self.I_all)
+        frequency_deviation = counts["frequency"][0]
+        spacing_violations = counts["spacing"][0]
 
-                if insts != []:
-                    weeks_scheduled.append(w)
-                    assignments[w] = insts
-
-                if p in self.leaders and self.solver.Value(self.leader_assignments[(p, w)]) == 1:
-                    weeks_leading.append(w)
-
-                frequency_violations = self.solver.Value(self.freq_penalties[p])
-
-            total_weeks = len(weeks_scheduled)
-            num_weeks_leading = len(weeks_leading)
-
-            # get spacing and leader penalties
-            penalties_p = []
-            if (p in self.leaders):
-                lead_penalties = self.leader_penalties[p]
-                for penalty in lead_penalties:
-                    penalty_value = self.solver.Value(penalty)
-                    if (penalty_value > 0):
-                        penalties_p.append(penalty)
-            
-            space_pens = self.spacing_penalties[p]
-            for penalty in space_pens:
-                penalty_value = self.solver.Value(penalty)
-                if (penalty_value > 0):
-                    penalties_p.append(penalty)
-
-            print(p, penalties_p)
-            
+        week_labels = np.array(self.T)
+        diagnostics = {}
+        for k, p in enumerate(self.P):
+            weeks = np.flatnonzero(scheduled[k])
             instrument_assignments_str = "; ".join(
-                f"Week {w}: {', '.join(i_list)}"
-                for w, i_list in assignments.items()
+                f"Week {self.T[t]}: {', '.join(self.I_all[j] for j in np.flatnonzero(x[k, t]))}"
+                for t in weeks
             )
 
             diagnostics[p] = {
-                "Total Weeks Scheduled": total_weeks,
-                "Number of Weeks Leading ": num_weeks_leading,
-                "Weeks Scheduled": weeks_scheduled,
-                "Weeks Leading": weeks_leading,
+                "Total Weeks Scheduled": int(total_weeks[k]),
+                "Number of Weeks Leading ": int(lead[k].sum()),
+                "Weeks Scheduled": week_labels[weeks].tolist(),
+                "Weeks Leading": week_labels[lead[k]].tolist(),
                 "Instruments": instrument_assignments_str,
-                "Frequency Deviation": frequency_violations
+                "Frequency Deviation": int(frequency_deviation[k]),
+                "Spacing Violations": int(spacing_violations[k])
             }
 
-
         return diagnostics
-    
-
- 
-        
@@ -0,0 +1,214 @@
+'''
+Saved schedules, so a refresh, a new session or a restart never needs another solve.
+
+Every finished solve is saved as a solution set, tagged with the roster fingerprint and the
+solve settings (the job options). A schedule is stored as
+    x         P x T x I assignments, bit-packed (np.packbits) and base64 encoded
+    leaders   the leader's row in `people` for every week, -1 when there is none
+so a 150 person, 26 week schedule takes about 4 KB instead of nested dicts of names.
+
+Tables (in the Repository's backend, Supabase or SQLite):
+    solution_sets   id, fingerprint, settings, people, weeks, instruments, count, created_at
+    solutions       id, set_id, k, x, leaders
+List columns are stored as JSON text. SQLite creates them itself, on Supabase they come
+from supabase/migrations/20261017000000_solution_store.sql.
+
+SolutionStore.save() and open() return a StoredSolutions, a list-like view of one set that
+the admin page browses with Prev/Next. Schedules are fetched and decoded (with their
+diagnostics) when they are first shown, and only the last few are kept in memory.
+'''
+import base64
+import json
+import time
+from collections import OrderedDict
+
+import numpy as np
+import streamlit as st
+
+from scripts.cache import roster_fingerprint
+from scripts.data_access import SOLUTION_SETS_TABLE, SOLUTIONS_TABLE, get_repository
+from scripts.scheduling_logic import ScheduleBuilder
+
+
+'''
+Assignments (P x T x I) and leaders (P x T) of a schedule, in the builder's order. Names
+that aren't on its roster are dropped.
+'''
+def schedule_arrays(builder, schedule):
+    r = builder.roster
+    x = np.zeros((len(builder.P), len(builder.T), len(builder.I_all)), dtype=bool)
+    lead = np.zeros((len(builder.P), len(builder.T)), dtype=bool)
+    for w, cells in schedule.items():
+        if w not in r.week_index:
+            continue
+        t = r.week_index[w]
+        for row, names in cells.items():
+            names = [names] if isinstance(names, str) else names or []
+            known = [r.person_index[n] for n in names if n in r.person_index]
+            if row == 'Leader':
+                lead[known, t] = True
+            elif row in r.instrument_index:
+                x[known, t, r.instrument_index[row]] = True
+    return x, lead
+
+
+def pack_schedule(x, lead):
+    leaders = np.where(lead.any(axis=0), lead.argmax(axis=0), -1)
+    return {
+        "x": base64.b64encode(np.packbits(x.ravel()).tobytes()).decode("ascii"),
+        "leaders": json.dumps(leaders.tolist()),
+    }
+
+
+def unpack_schedule(row, shape):
+    bits = np.unpackbits(np.frombuffer(base64.b64decode(row["x"]), dtype=np.uint8), count=int(np.prod(shape)))
+    x = bits.astype(bool).reshape(shape)
+    leaders = np.array(json.loads(row["leaders"]), dtype=int)
+    lead = np.zeros(shape[:2], dtype=bool)
+    weeks = np.flatnonzero(leaders >= 0)
+    lead[leaders[weeks], weeks] = True
+    return x, lead
+
+
+class SolutionStore:
+    def __init__(self, backend, cache_size=8):
+        self.backend = backend
+        # decoded schedules kept in memory per StoredSolutions
+        self.cache_size = cache_size
+
+    '''
+    Save `solutions` ([(solution, diagnostics)]) for the roster `data` and the settings
+    they were solved with, replacing an earlier set with the same roster and settings.
+    '''
+    def save(self, data, settings, solutions) -> "StoredSolutions":
+        builder = ScheduleBuilder(data, n=1)
+        set_id = roster_fingerprint(data, settings)
+        header = {
+            "id": set_id,
+            "fingerprint": roster_fingerprint(data),
+            "settings": json.dumps(settings, sort_keys=True, default=str),
+            "people": json.dumps(builder.P),
+            "weeks": json.dumps(builder.T),
+            "instruments": json.dumps(builder.I_all),
+            "count": len(solutions),
+            "created_at": time.time(),
+        }
+        rows = [
+            {"id": f"{set_id}:{k}", "set_id": set_id, "k": k, **pack_schedule(*schedule_arrays(builder, solution))}
+            for k, (solution, _) in enumerate(solutions)
+        ]
+        self.backend.upsert(SOLUTIONS_TABLE, rows, on_conflict="id")
+        self.backend.upsert(SOLUTION_SETS_TABLE, [header], on_conflict="id")
+
+        stored = StoredSolutions(self, header, builder)
+        for k, solution in enumerate(solutions[-self.cache_size:], start=max(0, len(solutions) - self.cache_size)):
+            stored.remember(k, solution)
+        return stored
+
+    '''
+    Saved sets for the roster `data`, newest first, as header dicts (settings decoded)
+    '''
+    def sets(self, data):
+        headers = self.backend.select(SOLUTION_SETS_TABLE, where={"fingerprint": roster_fingerprint(data)})
+        for header in headers:
+            header["settings"] = json.loads(header["settings"])
+        return sorted(headers, key=lambda h: h["created_at"], reverse=True)
+
+    '''
+    The set saved for `data` with these settings (the newest set when settings is None),
+    or None. Nothing but the header is read until a schedule is shown.
+    '''
+    def open(self, data, settings=None):
+        if settings is None:
+            headers = self.sets(data)
+        else:
+            headers = self.backend.select(SOLUTION_SETS_TABLE, where={"id": roster_fingerprint(data, settings)})
+        if not headers or not headers[0]["count"]:
+            return None
+        return StoredSolutions(self, headers[0], ScheduleBuilder(data, n=1))
+
+    def load(self, set_id, k):
+        rows = self.backend.select(SOLUTIONS_TABLE, where={"id": f"{set_id}:{k}"})
+        return rows[0] if rows else None
+
+    # every stored schedule of a set in one request, {k: row}
+    def load_all(self, set_id):
+        return {int(row["k"]): row for row in self.backend.select(SOLUTIONS_TABLE, where={"set_id": set_id})}
+
+
+'''
+List-like view of one saved set: len(), [k] -> (solution, diagnostics), and [k] = ... to
+replace a schedule (e.g. after a repair), which is saved too.
+'''
+class StoredSolutions:
+    def __init__(self, store, header, builder):
+        self.store = store
+        self.header = header
+        self.id = header["id"]
+        self.builder = builder
+        self.count = int(header["count"])
+        self.created_at = header["created_at"]
+        self.decoded = OrderedDict()  # k -> (solution, diagnostics), least recently shown first
+
+        # stored row of every person of the builder, which may list them in another order
+        people = {p: k for k, p in enumerate(json.loads(header["people"]))}
+        self.shape = (len(people), len(json.loads(header["weeks"])), len(json.loads(header["instruments"])))
+        self.rows = [people[p] for p in builder.P]
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, k):
+        k = range(self.count)[k]
+        if k in self.decoded:
+            self.decoded.move_to_end(k)
+            return self.decoded[k]
+
+        row = self.store.load(self.id, k)
+        if row is None:
+            raise IndexError(f"schedule {k} of set {self.id} is missing")
+        x, lead = unpack_schedule(row, self.shape)
+        arrays = x[self.rows], lead[self.rows]
+        return self.remember(k, (self.builder.extract_solution(arrays), self.builder.run_diagnostics(arrays)))
+
+    '''
+    All schedules as stacked arrays, (n x P x T x I) assignments and (n x P x T) leaders in
+    the builder's order, read in one request without decoding them into dicts
+    '''
+    def stacked(self):
+        rows = self.store.load_all(self.id)
+        x = np.zeros((self.count, len(self.rows), *self.shape[1:]), dtype=bool)
+        lead = np.zeros((self.count, len(self.rows), self.shape[1]), dtype=bool)
+        for k in range(self.count):
+            if k in rows:
+                stored_x, stored_lead = unpack_schedule(rows[k], self.shape)
+                x[k], lead[k] = stored_x[self.rows], stored_lead[self.rows]
+            else:
+                # not in the store (a write failed), use the schedule kept in memory
+                x[k], lead[k] = schedule_arrays(self.builder, self[k][0])
+        return x, lead
+
+    # kept in memory first, so the schedule is shown even if saving it fails
+    def __setitem__(self, k, value):
+        k = range(self.count)[k]
+        self.remember(k, value)
+        x, lead = schedule_arrays(self.builder, value[0])
+        stored_x, stored_lead = np.zeros(self.shape, dtype=bool), np.zeros(self.shape[:2], dtype=bool)
+        stored_x[self.rows], stored_lead[self.rows] = x, lead
+        row = {"id": f"{self.id}:{k}", "set_id": self.id, "k": k, **pack_schedule(stored_x, stored_lead)}
+        self.store.backend.upsert(SOLUTIONS_TABLE, [row], on_conflict="id")
+
+    def remember(self, k, value):
+        self.decoded[k] = value
+        self.decoded.move_to_end(k)
+        while len(self.decoded) > self.store.cache_size:
+            self.decoded.popitem(last=False)
+        return value
+
+
+'''
+Store shared by every session, on the same backend as get_repository()
+'''
+@st.cache_resource
+def get_solution_store(_conn=None):
+    return SolutionStore(get_repository(_conn).backend)
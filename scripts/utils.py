@@ -1 +1,52 @@
+import re
+
+import pandas as pd
+
 instruments = ["electric_guitar", "acoustic_guitar", "vocals", "piano", "cajon", "strings"]
+
+# Planning horizon shown on the form: availability column -> date label.
+# Add a column per service (e.g. several per week) to extend the horizon; the scheduler
+# plans over every w<number> column present in the data.
+week_labels = {
+    "w2": "Jan 14",
+    "w3": "Jan 21",
+    "w4": "Jan 28",
+    "w5": "Feb 4",
+    "w6": "Feb 11",
+    "w7": "Feb 18",
+    "w8": "Feb 25",
+    "w9": "March 4",
+    "w10": "March 11",
+}
+
+# num_weeks and the leader rotation are asked for per quarter, and scaled to the horizon
+weeks_per_quarter = 10
+leader_weeks_per_quarter = (1, 2)
+
+def week_columns(data):
+    return sorted(int(c[1:]) for c in data.columns if re.fullmatch(r"w\d+", c))
+
+'''
+Convert between solutions ({week: {instrument: [people], 'Leader': leader}}) and the
+table shown in the admin editor (one column per week, "a, b" strings in each cell).
+'''
+def schedule_to_table(schedule):
+    return pd.DataFrame(schedule).map(
+        lambda x: ", ".join(x) if isinstance(x, list) else str(x)
+    )
+
+# names in one "a, b" cell
+def cell_names(cell):
+    return [n.strip() for n in str(cell).split(",") if n.strip() not in ("", "nan", "None")]
+
+def table_to_schedule(table):
+    schedule = {}
+    for week in table.columns:
+        schedule[int(week)] = {}
+        for row, cell in table[week].items():
+            names = cell_names(cell)
+            if row == 'Leader':
+                schedule[int(week)]['Leader'] = names[0] if names else None
+            else:
+                schedule[int(week)][row] = names
+    return schedule
@@ -0,0 +1,37 @@
+-- Saved schedules (scripts/solution_store.py): one row per solve in solution_sets, one row per
+-- schedule in solutions. List columns (people, weeks, instruments, leaders) hold JSON text,
+-- x the base64 encoded bit-packed assignments.
+
+create table if not exists solution_sets (
+    id text primary key,          -- roster fingerprint + solve settings
+    fingerprint text not null,    -- roster fingerprint, to find the sets of a roster
+    settings text,
+    people text,
+    weeks text,
+    instruments text,
+    count integer not null default 0,
+    created_at double precision
+);
+create index if not exists solution_sets_fingerprint on solution_sets (fingerprint);
+
+-- no foreign key: schedules are written before their set's header
+create table if not exists solutions (
+    id text primary key,          -- "<set id>:<k>"
+    set_id text not null,
+    k integer not null,
+    x text,
+    leaders text
+);
+create index if not exists solutions_set on solutions (set_id, k);
+
+-- only admins read and write saved schedules
+alter table solution_sets enable row level security;
+alter table solutions enable row level security;
+
+create policy "admins manage solution sets" on solution_sets for all to authenticated
+    using ((auth.jwt() ->> 'email') in (select email from admins))
+    with check ((auth.jwt() ->> 'email') in (select email from admins));
+
+create policy "admins manage solutions" on solutions for all to authenticated
+    using ((auth.jwt() ->> 'email') in (select email from admins))
+    with check ((auth.jwt() ->> 'email') in (select email from admins));
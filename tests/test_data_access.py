@@ -0,0 +1,93 @@
+from scripts.data_access import ADMINS_TABLE, ROSTER_TABLE, ROSTER_WEEKS, Repository, SQLiteBackend
+from scripts.utils import instruments
+
+
+class CountingBackend(SQLiteBackend):
+    def __init__(self):
+        super().__init__(":memory:")
+        self.selects = 0
+        self.upserts = []
+
+    def select(self, table, columns="*", where=None):
+        self.selects += 1
+        return super().select(table, columns, where)
+
+    def upsert(self, table, rows, on_conflict):
+        self.upserts.append((table, len(rows)))
+        super().upsert(table, rows, on_conflict)
+
+
+def response(name, **values):
+    row = {"name": name, "email": f"{name}@example.com", "phone": "1", "num_weeks": 2}
+    row.update({w: False for w in ROSTER_WEEKS})
+    row.update({i: False for i in instruments})
+    row.update(values)
+    return row
+
+
+def test_roster_table_has_the_hosted_week_columns():
+    backend = SQLiteBackend()
+    columns = backend.column_types(ROSTER_TABLE)
+    assert all(columns[w] == "BOOLEAN" for w in ROSTER_WEEKS)
+    assert ROSTER_WEEKS[0] == "w1" and ROSTER_WEEKS[-1] == "w10"
+
+
+def test_booleans_round_trip():
+    backend = SQLiteBackend()
+    Repository(backend).save_response(response("ann", w2=True, vocals=True))
+    row = backend.select(ROSTER_TABLE)[0]
+    assert row["w2"] is True and row["w3"] is False and row["vocals"] is True
+    assert row["num_weeks"] == 2
+
+
+def test_reads_are_cached_until_a_write():
+    backend = CountingBackend()
+    repo = Repository(backend)
+    repo.save_response(response("ann"))
+    repo.roster()
+    repo.roster()
+    assert backend.selects == 1
+
+    repo.save_response(response("bob"))
+    assert len(repo.roster()) == 2
+    assert backend.selects == 2
+
+
+def test_admin_set_is_reused_until_reloaded():
+    repo = Repository(SQLiteBackend())
+    repo.add_admins(["a@example.com"])
+    admins = repo.admin_emails()
+    assert admins == {"a@example.com"}
+    assert repo.admin_emails() is admins
+
+    repo.add_admins(["b@example.com"])
+    assert repo.admin_emails() == {"a@example.com", "b@example.com"}
+
+
+def test_leader_changes_are_one_upsert_of_the_changed_rows():
+    backend = CountingBackend()
+    repo = Repository(backend)
+    for name in ("ann", "bob", "cat"):
+        repo.save_response(response(name))
+    backend.upserts.clear()
+
+    assert repo.set_leaders({"ann": True, "bob": False, "cat": True}) == 2
+    assert backend.upserts == [(ROSTER_TABLE, 2)]
+    leaders = repo.roster().set_index("name")["is_leader"]
+    assert leaders.to_dict() == {"ann": True, "bob": False, "cat": True}
+
+    assert repo.set_leaders({"ann": True}) == 0
+    assert backend.upserts == [(ROSTER_TABLE, 2)]
+
+
+def test_new_week_columns_are_added_on_write():
+    backend = SQLiteBackend()
+    backend.upsert(ROSTER_TABLE, [response("ann", w12=True)], on_conflict="email")
+    assert backend.column_types(ROSTER_TABLE)["w12"] == "BOOLEAN"
+    assert backend.select(ROSTER_TABLE, where={"name": "ann"})[0]["w12"] is True
+
+
+def test_select_filters_rows():
+    backend = SQLiteBackend()
+    backend.upsert(ADMINS_TABLE, [{"email": "a@example.com"}, {"email": "b@example.com"}], on_conflict="email")
+    assert backend.select(ADMINS_TABLE, "email", where={"email": "b@example.com"}) == [{"email": "b@example.com"}]
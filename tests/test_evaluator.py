@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from benchmarks.roster_generator import synthetic_roster
+from scripts.evaluator import ScheduleEvaluator
+from scripts.scheduling_logic import ScheduleBuilder
+
+
+@pytest.fixture(scope="module")
+def solved():
+    data = synthetic_roster(20, horizon=8, seed=0, density=0.8, leader_ratio=0.3)
+    builder = ScheduleBuilder(data, n=1)
+    builder.build_model(sparse=True)
+    builder.set_solve_profile(workers=1, time_limit=20)
+    solution, _ = builder.get_solutions(1)[0]
+    return builder, solution, builder.solver.ObjectiveValue()
+
+
+def state(evaluator):
+    return (
+        evaluator.x.copy(), evaluator.lead.copy(), evaluator.scheduled.copy(),
+        evaluator.total.copy(), evaluator.freq.copy(), evaluator.spacing_pen.copy(), evaluator.gap_pen.copy(),
+        dict(evaluator.cell_issues), dict(evaluator.person_issues), evaluator.penalties(),
+    )
+
+
+def assert_same(a, b):
+    for left, right in zip(a, b):
+        if isinstance(left, np.ndarray):
+            assert np.array_equal(left, right)
+        else:
+            assert left == right
+
+
+def test_objective_matches_the_solver(solved):
+    builder, solution, objective = solved
+    evaluator = ScheduleEvaluator(builder, solution)
+    assert evaluator.objective == objective
+    assert evaluator.valid, evaluator.violations()
+
+
+def test_random_edits_match_a_full_recompute(solved):
+    builder, solution, _ = solved
+    rng = np.random.default_rng(1)
+    schedule = {w: {row: (list(v) if isinstance(v, list) else v) for row, v in cells.items()} for w, cells in solution.items()}
+    evaluator = ScheduleEvaluator(builder, schedule)
+    rows = builder.I_all + ['Leader']
+
+    for step in range(500):
+        w = builder.T[rng.integers(len(builder.T))]
+        row = rows[rng.integers(len(rows))]
+        size = 1 if row == 'Leader' else int(rng.integers(0, 4))
+        names = [builder.P[k] for k in rng.choice(len(builder.P), size=size, replace=False)]
+        if rng.random() < 0.05:
+            names.append("Nobody")
+        evaluator.set_cell(w, row, names)
+        schedule[w][row] = names
+
+        if step % 25 == 0 or step == 499:
+            assert_same(state(evaluator), state(ScheduleEvaluator(builder, schedule)))
+
+    evaluator.load(schedule)
+    assert_same(state(evaluator), state(ScheduleEvaluator(builder, schedule)))
@@ -0,0 +1,69 @@
+'''
+Both pages on the SQLite backend, without Supabase secrets or the Supabase connection
+'''
+import os
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from scripts.data_access import ROSTER_TABLE, ROSTER_WEEKS, Repository, SQLiteBackend
+from scripts.utils import instruments
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def db(tmp_path):
+    st.cache_resource.clear()  # the repository is shared per process
+    yield str(tmp_path / "scheduler.db")
+    st.cache_resource.clear()
+
+
+def app(page, db):
+    at = AppTest.from_file(os.path.join(root, "views", page), default_timeout=30)
+    at.secrets["DATA_BACKEND"] = "sqlite"
+    at.secrets["SQLITE_PATH"] = db
+    at.secrets["LOCAL_ADMIN_EMAIL"] = "admin@example.com"
+    return at
+
+
+def test_form_saves_a_response(db):
+    at = app("form.py", db)
+    at.run()
+    assert not at.exception
+
+    at.text_input(key="name_input").input("Ann")
+    at.text_input(key="email_input").input("Ann@Example.com")
+    at.text_input(key="phone_input").input("555")
+    at.checkbox(key="check_w2").check()
+    at.checkbox(key="check_vocals").check()
+    at.radio(key="freq_input").set_value("Twice")
+    at.button[0].click().run()
+    assert not at.exception
+    assert at.success[0].value.startswith("Thank you")
+
+    rows = SQLiteBackend(db).select(ROSTER_TABLE)
+    assert [(r["email"], r["w2"], r["w3"], r["vocals"], r["num_weeks"]) for r in rows] == [("ann@example.com", True, False, True, 2)]
+
+
+def test_admin_page_needs_a_listed_admin(db):
+    at = app("admin.py", db)
+    at.run()
+    assert "not an authorized admin" in at.error[0].value
+
+
+def test_admin_page_shows_the_roster(db):
+    repo = Repository(SQLiteBackend(db))
+    repo.add_admins(["admin@example.com"])
+    for k in range(4):
+        row = {"name": f"person{k}", "email": f"p{k}@example.com", "phone": "1", "num_weeks": 2}
+        row.update({w: True for w in ROSTER_WEEKS})
+        row.update({i: i == "vocals" for i in instruments})
+        repo.save_response(row)
+
+    at = app("admin.py", db)
+    at.run()
+    assert not at.exception
+    assert "View Responses" in [s.value for s in at.subheader]
+    assert len(at.dataframe[0].value) == 4
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.roster_generator import synthetic_roster
+from scripts.scheduling_logic import ScheduleBuilder
+
+
+def roster(seed=0):
+    return synthetic_roster(14, horizon=6, seed=seed, density=0.85, leader_ratio=0.3)
+
+
+def builder_for(data, penalty_encoding="pairwise"):
+    builder = ScheduleBuilder(data, n=1)
+    builder.build_model(sparse=True, penalty_encoding=penalty_encoding)
+    builder.set_solve_profile(workers=1, time_limit=20)
+    return builder
+
+
+def objective(builder):
+    builder.get_solutions(1)
+    assert builder.profile.solves[-1]["status"] == "OPTIMAL"
+    return builder.solver.ObjectiveValue()
+
+
+'''
+One person leaves, one can make another week, one picks up piano and a newcomer joins
+'''
+def edit(data, round=0):
+    data = data.copy()
+    people = data.index[round * 3:]
+    data = data.drop(index=people[0])
+    data.loc[people[1], f"w{round % 6 + 1}"] = True
+    data.loc[people[2], "piano"] = True
+    new = data.iloc[[0]].copy()
+    new["name"], new["email"] = f"newcomer{round}", f"newcomer{round}@example.com"
+    return pd.concat([data, new], ignore_index=True)
+
+
+@pytest.mark.parametrize("penalty_encoding", ["pairwise", "window"])
+def test_update_matches_a_fresh_build(penalty_encoding):
+    builder = builder_for(roster(), penalty_encoding)
+    objective(builder)
+    data = edit(roster())
+
+    assert builder.update_roster(data, max_changes=4)
+    assert builder.model.validate() == ""
+    assert objective(builder) == objective(builder_for(data, penalty_encoding))
+
+
+def test_falls_back_to_a_rebuild():
+    # nobody plays cajon, so the weekly cajon limits are simplified away and can't take a player
+    data = roster(seed=4)
+    data["cajon"] = False
+    builder = builder_for(data)
+    objective(builder)
+    constraints = builder.model.Proto().constraints
+    cajon = [constraints[c] for w in builder.T for c, _ in builder.week_constraints[(w, "cajon")]]
+    assert not all(ct.has_linear() for ct in cajon)
+    edited = edit(data)
+    edited.loc[edited.index[-1], ["cajon", "strings", "electric_guitar"]] = [True, False, False]
+
+    assert not builder.update_roster(edited, max_changes=len(edited))
+    assert builder.dead_variables == 0
+    assert sorted(builder.P) == sorted(edited["name"])
+    assert objective(builder) == objective(builder_for(edited))
+
+
+def test_owned_ranges_stay_valid_after_repeated_edits():
+    data = roster(seed=5)
+    builder = builder_for(data)
+    for round in range(3):
+        data = edit(data, round)
+        assert builder.update_roster(data, max_changes=len(data))
+
+        proto = builder.model.Proto()
+        assert sorted(builder.owned) == sorted(builder.P)
+        ranges = sorted(r for p in builder.P for r in builder.owned[p])
+        for first_var, end_var, first_ct, end_ct in ranges:
+            assert 0 <= first_var <= end_var <= len(proto.variables)
+            assert 0 <= first_ct <= end_ct <= len(proto.constraints)
+        # no two people own the same variables or constraints
+        for (_, end_var, _, end_ct), (next_var, _, next_ct, _) in zip(ranges, ranges[1:]):
+            assert end_var <= next_var and end_ct <= next_ct
+        # every live assignment variable belongs to someone on the roster
+        live = np.concatenate([builder.x_index.ravel(), builder.leader_index.ravel()])
+        assert len(builder.x_index) == len(builder.P)
+        assert all(list(proto.variables[v].domain) != [0, 0] for v in live[live >= 0])
+
+    assert builder.model.validate() == ""
+    assert objective(builder) == objective(builder_for(data))
@@ -1,15 +1,24 @@
+import time
 import streamlit as st
 import pandas as pd
-from st_supabase_connection import SupabaseConnection
-from scripts.scheduling_logic import ScheduleBuilder 
+from scripts.jobs import JobRunner, DONE, CANCELLED
+from scripts.cache import FingerprintCache, roster_fingerprint
+from scripts.profiling import ModelProfile
+from scripts.scheduling_logic import ScheduleBuilder, solve_presets
+from scripts.evaluator import ScheduleEvaluator
+from scripts.comparison import SolutionComparison, stack_solutions
+from scripts.utils import schedule_to_table, table_to_schedule, week_columns, weeks_per_quarter
 from scripts.auth import check_auth, logout 
+from scripts.data_access import get_connection, get_repository
+from scripts.solution_store import StoredSolutions, get_solution_store
 
 # DB Connection
-conn = st.connection("supabase", type=SupabaseConnection)
+conn = get_connection()
+repo = get_repository(conn)
+store = get_solution_store(conn)
 
 # Make sure that the user is authorized
-admin_res = conn.table("admins").select("email").execute()
-allowed_admins = [row['email'] for row in admin_res.data] if admin_res else []
+allowed_admins = repo.admin_emails()
 user = check_auth(conn, allowed_admins)
 
 st.sidebar.success(f"Logged in: {user.email}")
@@ -21,18 +30,204 @@ if 'solutions' not in st.session_state:
     st.session_state.update({
         'solutions': None,
         'curr_sol': 0,
-        'edited_schedule': None
+        'edited_schedule': None,
+        'editor_version': 0,
+        'evaluator': None,
+        'repair_target': None,
+        'job_id': None
     })
 
-def handle_generate(data):
-    scheduler = ScheduleBuilder(data=data, n=5)
-    scheduler.build_model()
-    sols = scheduler.get_solutions()
-    if sols:
-        st.session_state.solutions = sols
+# One solve thread shared by all sessions, so solves never run in the script thread.
+# Solved rosters are cached by fingerprint (and on disk when SOLUTION_CACHE_DIR is set).
+# With SNAPSHOT_DIR set, every model is saved there for benchmarks.replay.
+@st.cache_resource
+def get_job_runner():
+    cache = FingerprintCache(max_entries=32, cache_dir=st.secrets.get("SOLUTION_CACHE_DIR"))
+    return JobRunner(max_workers=1, cache=cache, snapshot_dir=st.secrets.get("SNAPSHOT_DIR"))
+
+runner = get_job_runner()
+
+def handle_generate(data, min_distance=4, gap=0.05, preset="balanced", leader_first=False, log_search=False):
+    # replace any solve still running for this session
+    if st.session_state.job_id:
+        runner.cancel(st.session_state.job_id)
+    solve_profile = {**solve_presets[preset], "log_search": log_search}
+    if len(week_columns(data)) > 2 * weeks_per_quarter:
+        # long horizons (e.g. a whole year) are planned a quarter at a time
+        job = runner.submit(
+            data, mode="rolling", window=weeks_per_quarter, step=weeks_per_quarter // 2, time_limit=30,
+            solve_profile=solve_profile
+        )
+    elif leader_first:
+        # big rosters: settle the leader rotation first, then fill in the instruments
+        job = runner.submit(data, mode="leader_first", solve_profile=solve_profile)
+    else:
+        job = runner.submit(data, n=5, min_distance=min_distance, gap=gap, solve_profile=solve_profile)
+    st.session_state.job_id = job.id
+
+def handle_repair(data, edited_df, locked, target, preset="balanced"):
+    if st.session_state.job_id:
+        runner.cancel(st.session_state.job_id)
+    job = runner.submit(
+        data, mode="repair", schedule=table_to_schedule(edited_df), locked=locked, time_limit=30,
+        solve_profile=solve_presets[preset]
+    )
+    st.session_state.job_id = job.id
+    st.session_state.repair_target = target
+
+def cancel_generate():
+    if st.session_state.job_id:
+        runner.cancel(st.session_state.job_id)
+
+def finish_generate_early():
+    job = runner.get(st.session_state.job_id) if st.session_state.job_id else None
+    if job is not None:
+        job.finish_early()
+
+# Poll the running solve once a second without rerunning the whole page
+@st.fragment(run_every=1.0 if st.session_state.job_id else None)
+def show_job_status():
+    job = runner.get(st.session_state.job_id) if st.session_state.job_id else None
+    if job is None:
+        return
+
+    if not job.done:
+        st.progress(job.progress, text=job.stage)
+        if job.best_objective is not None:
+            st.caption(f"Best score so far: {job.best_objective:g} ({job.elapsed:.0f}s)")
+        if len(job.objectives) > 1:
+            progress_df = pd.DataFrame(job.objectives, columns=["Seconds", "Score"])
+            st.line_chart(progress_df, x="Seconds", y="Score", height=150)
+
+        # the best schedule so far, replaced in place whenever the search improves it
+        best = job.best_so_far
+        if best is not None:
+            st.caption(f"Best schedule so far (score {best['objective']:g}, found after {best['seconds']:.1f}s)")
+            st.dataframe(schedule_to_table(best["solution"]), width="stretch")
+
+        col1, col2 = st.columns([1, 3])
+        col1.button("Cancel", on_click=cancel_generate)
+        if best is not None and job.searching:
+            col2.button(
+                "Good enough, stop searching",
+                on_click=finish_generate_early,
+                help="Keep the best schedule so far and only look for alternatives close to it",
+            )
+        return
+
+    # hand the finished job's schedules over to the browser below, the job is only let go
+    # once that worked (an error here leaves it to be picked up on the next poll)
+    st.session_state.solve_profile = None if job.cached else job.profile
+    if job.options.get("mode") == "repair" and job.status in (DONE, CANCELLED):
+        # swap the repaired schedule in for the one being edited and reset the editor
+        if job.result:
+            try:
+                st.session_state.solutions[st.session_state.repair_target] = job.result[0]
+            except Exception:
+                # a saved set keeps the repaired schedule in memory even when saving fails
+                st.session_state.store_warning = "The repaired schedule couldn't be saved, it will be gone after a refresh."
+            st.session_state.editor_version += 1
+        elif job.status == DONE:
+            st.session_state.job_error = "The edited schedule couldn't be repaired."
+            st.session_state.job_issues = job.issues
+    elif job.status == CANCELLED and not job.result:
+        # nothing found before the cancel, keep the schedules on screen (e.g. an opened saved set)
+        st.session_state.job_notice = "Generation cancelled before any schedule was found."
+    elif job.status in (DONE, CANCELLED):
+        # finished sets are saved, so they survive refreshes and restarts
+        st.session_state.solutions = job.result or []
+        if job.status == DONE and job.result:
+            try:
+                st.session_state.solutions = store.save(job.data, job.options, job.result)
+            except Exception:
+                st.session_state.store_warning = "These schedules couldn't be saved, they will be gone after a refresh."
+        st.session_state.evaluator = None
         st.session_state.curr_sol = 0
+        st.session_state.solve_issues = job.issues
     else:
-        st.session_state.solutions = []
+        st.session_state.solutions = None
+        st.session_state.job_error = str(job.error)
+    st.session_state.job_id = None
+    runner.release(job.id)
+    st.rerun()
+
+# Where the time of the last solve went: model building phases, constraint families and CP-SAT
+def show_profile(profile):
+    if not profile:
+        st.caption("These schedules were loaded from the cache, no solve was run.")
+        return
+
+    decomposition = profile.get("decomposition")
+    if decomposition:
+        if decomposition["fallback"]:
+            st.caption("Leader-first solve: the fixed leaders didn't work out, so everything was solved together.")
+        else:
+            st.caption("Leader-first solve: leaders were planned first, then the instruments around them.")
+        if decomposition.get("gap_to_joint") is not None:
+            st.caption(f"At most {decomposition['gap_to_joint']:.1%} worse than solving everything together.")
+
+    phases, families, solves = ModelProfile.tables(profile)
+    if not solves.empty:
+        # the gap of the last solve that optimized something (pool alternatives don't)
+        scored = solves[solves['gap'].notna()]
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Solve time", f"{solves['wall_time'].sum():.2f}s")
+        col2.metric("Conflicts", f"{int(solves['conflicts'].sum()):,}")
+        col3.metric("Branches", f"{int(solves['branches'].sum()):,}")
+        if scored.empty:
+            col4.metric("Gap", "-")
+        else:
+            last = scored.iloc[-1]
+            col4.metric("Gap", f"{last['gap']:.1%}", help=f"Of the last solve with a score: {last['solve']}")
+
+    st.markdown("**Phases** (seconds)")
+    st.dataframe(phases, hide_index=True, width="stretch")
+    st.markdown("**Constraint families**")
+    st.dataframe(families, hide_index=True, width="stretch")
+    st.markdown("**Solver runs**")
+    st.dataframe(solves, hide_index=True, width="stretch")
+
+# Evaluator for the schedule being edited, rebuilt when another option is shown or after a repair
+def get_evaluator(data, key, schedule):
+    state = st.session_state.get('evaluator')
+    if state is None or state['key'] != key:
+        evaluator = ScheduleEvaluator(ScheduleBuilder(data, n=1), schedule)
+        state = st.session_state.evaluator = {
+            'key': key, 'evaluator': evaluator, 'table': schedule_to_table(schedule), 'generated': evaluator.objective
+        }
+    return state
+
+# feed the evaluator only the cells that changed since the last rerun
+def check_edits(state, edited_df):
+    table = state['table']
+    changed = edited_df.to_numpy() != table.to_numpy()
+    for r, c in zip(*changed.nonzero()):
+        state['evaluator'].set_table_cell(int(table.columns[c]), table.index[r], edited_df.iat[r, c])
+    state['table'] = edited_df.copy()
+
+# red background on cells that break a rule
+def highlight_issues(table, cell_issues):
+    return pd.DataFrame(
+        [["background-color: #ffd6d6" if (int(w), row) in cell_issues else "" for w in table.columns] for row in table.index],
+        index=table.index, columns=table.columns,
+    )
+
+# comparison of all options, recomputed when they change (a new solve or a repair)
+def get_comparison(data, solutions):
+    key = (id(solutions), len(solutions), st.session_state.editor_version)
+    state = st.session_state.get('comparison')
+    if state is None or state['key'] != key:
+        builder = solutions.builder if isinstance(solutions, StoredSolutions) else ScheduleBuilder(data, n=1)
+        comparison = SolutionComparison(builder, *stack_solutions(builder, solutions))
+        state = st.session_state.comparison = {'key': key, 'comparison': comparison}
+    return state['comparison']
+
+# green for cells that are the same in every option, yellow for contested ones
+def highlight_agreement(table, locked):
+    return pd.DataFrame(
+        [["background-color: #d9f2d9" if (int(w), row) in locked else "background-color: #fff3cd" for w in table.columns] for row in table.index],
+        index=table.index, columns=table.columns,
+    )
 
 def next_schedule():
     if st.session_state.solutions:
@@ -45,15 +240,25 @@ def prev_schedule():
 # --- UI LOGIC ---
 st.title("Admin Scheduling Dashboard")
 
-# Fetch data from supabase DB
-response = conn.table("team_availability").select("*").execute()
-df = pd.DataFrame(response.data)
+# Fetch responses (cached for a minute, refreshed after every write)
+df = repo.roster()
 
 if df.empty:
     st.warning("No responses yet")
     st.stop()
 
 else:
+    # open the newest schedules saved for this roster (once per roster), without solving
+    fingerprint = roster_fingerprint(df)
+    if st.session_state.solutions is None and not st.session_state.job_id and st.session_state.get('saved_roster') != fingerprint:
+        st.session_state.saved_roster = fingerprint
+        try:
+            saved = store.open(df)
+        except Exception:
+            saved = None  # no saved schedules (e.g. the store's tables don't exist yet), generate new ones
+        if saved is not None:
+            st.session_state.update(solutions=saved, curr_sol=0, evaluator=None, solve_profile=None)
+
     st.subheader("View Responses")
     st.dataframe(df)
 
@@ -70,31 +275,66 @@ else:
                 selected_leaders[name] = st.checkbox(name, value=is_leader_map.get(name, False))
                 
             if st.form_submit_button("Update"):
-                for name, is_lead in selected_leaders.items():
-                    conn.table("team_availability").update({"is_leader": is_lead}).eq("name", name).execute()
+                # one request for everyone whose leader flag changed
+                repo.set_leaders(selected_leaders)
                 st.success("Done!")
                 st.rerun()
 
     # Generate Schedules
     st.divider()
-    st.button("Generate New Schedules", on_click=handle_generate(df))
+    with st.expander("Schedule Options", expanded=False):
+        preset = st.radio(
+            "Solve mode", list(solve_presets), index=1, horizontal=True,
+            format_func=str.capitalize,
+            help="Fast draft returns a usable schedule in about 10s, balanced in about 30s, "
+                 "best searches up to 2 minutes for the optimal schedule",
+        )
+        min_distance = st.number_input("Minimum changes between options", min_value=1, value=4)
+        gap_pct = st.slider("Allowed score gap from best (%)", min_value=0, max_value=25, value=5)
+        leader_first = st.checkbox(
+            "Plan leaders first",
+            help="Faster for large teams: the leader rotation is settled first and the instruments are "
+                 "filled in around it. Gives a single schedule that may score slightly worse.",
+        )
+        log_search = st.checkbox(
+            "Detailed solver profile",
+            help="Record the solver's search log to split every solve into presolve and search time. "
+                 "Makes solving a little slower.",
+        )
+    st.button(
+        "Generate New Schedules", on_click=handle_generate,
+        args=(df, min_distance, gap_pct / 100, preset, leader_first, log_search),
+    )
+    show_job_status()
+    if st.session_state.get('job_error'):
+        st.error(f"Schedule generation failed: {st.session_state.pop('job_error')}")
+        # conflicting rules (and edits) of a failed repair
+        for issue in st.session_state.pop('job_issues', []):
+            st.markdown(f"- {issue}")
+    if st.session_state.get('job_notice'):
+        st.info(st.session_state.pop('job_notice'))
+    if st.session_state.get('store_warning'):
+        st.warning(st.session_state.pop('store_warning'))
 
     if st.session_state.solutions is not None:
         if not st.session_state.solutions:
             st.error("No feasible schedules found with current constraints.")
+            for issue in st.session_state.get('solve_issues', []):
+                st.markdown(f"- {issue}")
         else:
             curr_idx = st.session_state.curr_sol
             sols_count = len(st.session_state.solutions)
             
             st.subheader(f"Schedule Option {curr_idx + 1} of {sols_count}")
+            if isinstance(st.session_state.solutions, StoredSolutions):
+                saved_at = time.strftime("%b %d %H:%M", time.localtime(st.session_state.solutions.created_at))
+                st.caption(f"Saved {saved_at}")
             
             # Extract current solution
             raw_schedule, raw_diags = st.session_state.solutions[curr_idx]
             
             # Formatting for display
-            schedule_df = pd.DataFrame(raw_schedule).map(
-                lambda x: ", ".join(x) if isinstance(x, list) else str(x)
-            )
+            schedule_df = schedule_to_table(raw_schedule)
             diag_df = pd.DataFrame(raw_diags)
 
             # Navigation Columns
@@ -106,11 +346,41 @@ else:
             # We store the edited version in state so it persists during the session
             edited_df = st.data_editor(
                 schedule_df,
-                key=f"editor_{curr_idx}",
+                key=f"editor_{curr_idx}_{st.session_state.editor_version}",
                 width="stretch"
             )
+            edited_df.columns = schedule_df.columns  # the editor returns week labels as strings
             st.session_state.edited_schedule = edited_df
 
+            # check the edits against the scheduling rules as they are made
+            evaluator_state = get_evaluator(df, (curr_idx, st.session_state.editor_version), raw_schedule)
+            check_edits(evaluator_state, edited_df)
+            evaluator = evaluator_state['evaluator']
+            score = evaluator.objective
+            change = score - evaluator_state['generated']
+            st.caption(f"Score: {score:g}" + (f" ({change:+g} from the generated schedule, lower is better)" if change else ""))
+            violations = evaluator.violations()
+            if violations:
+                st.warning(f"{len(violations)} broken scheduling rule{'s' if len(violations) != 1 else ''}, marked in red:")
+                st.dataframe(
+                    edited_df.style.apply(highlight_issues, cell_issues=evaluator.cell_issues, axis=None),
+                    width="stretch",
+                )
+                st.dataframe(pd.DataFrame(violations), hide_index=True, width="stretch")
+
+            # cells the admin touched are kept as-is, the rest is re-solved around them
+            edited_cells = [
+                (int(w), row) for w in schedule_df.columns for row in schedule_df.index
+                if edited_df.at[row, w] != schedule_df.at[row, w]
+            ]
+            if edited_cells:
+                st.button(
+                    "Repair Schedule",
+                    on_click=handle_repair,
+                    args=(df, edited_df, edited_cells, curr_idx, preset),
+                    help="Keep your edits and adjust the rest of the schedule as little as possible",
+                )
+
             # Export Actions
             csv = edited_df.to_csv(index=False).encode("utf-8")
             st.download_button(
@@ -120,5 +390,25 @@ else:
                 mime="text/csv",
             )
 
+            if sols_count > 1:
+                with st.expander("Compare Options"):
+                    comparison = get_comparison(df, st.session_state.solutions)
+                    locked = comparison.locked_cells()
+                    st.caption(
+                        f"{len(locked)} of {comparison.agreement.size} cells are the same in every option (green), "
+                        "the others differ between options (yellow)."
+                    )
+                    st.dataframe(schedule_df.style.apply(highlight_agreement, locked=locked, axis=None), width="stretch")
+                    st.markdown("**Scores** (lower is better)")
+                    scores = comparison.penalties.assign(**{"cells changed from this option": comparison.distances[curr_idx]})
+                    st.dataframe(scores, width="stretch")
+                    st.markdown("**Cells that differ between options**")
+                    st.dataframe(comparison.distance_table(), width="stretch")
+                    st.markdown("**Weeks per person across options** (most varied first)")
+                    st.dataframe(comparison.load_spread(), width="stretch")
+
             with st.expander("View Details"):
                 st.dataframe(diag_df, use_container_width=True)
+
+            with st.expander("Solver Profile"):
+                show_profile(st.session_state.get('solve_profile'))
@@ -1,11 +1,12 @@
 import streamlit as st
 import pandas as pd
-from st_supabase_connection import SupabaseConnection
+from scripts.utils import week_labels
+from scripts.data_access import get_connection, get_repository
 
 st.title("Worship Scheduling Availability")
 
 # Initialize Connection
-conn = st.connection("supabase", type=SupabaseConnection)
+conn = get_connection()
 
 # Initialize Session State
 if "form_data" not in st.session_state:
@@ -29,10 +30,8 @@ with st.form("user_form"):
     st.subheader("Availability")
     st.write("Please select all weeks that you are available!")
     availability = {}
-    weeks = ["Jan 14", "Jan 21", "Jan 28", "Feb 4", "Feb 11", "Feb 18", "Feb 25", "March 4", "March 11"]
-    for i in range(0, len(weeks)):
-        key = f"w{i + 2}"
-        availability[key] = st.checkbox(f"Week {i + 2}: {weeks[i]}", key=f"check_{key}")
+    for key, label in week_labels.items():
+        availability[key] = st.checkbox(f"Week {key[1:]}: {label}", key=f"check_{key}")
 
     st.divider()
     st.subheader("Instruments")
@@ -84,7 +83,7 @@ if submitted:
         
         # DB Write
         try:
-            conn.table("team_availability").upsert(form_payload, on_conflict="email").execute()
+            get_repository(conn).save_response(form_payload)
             st.session_state.done = True
             st.rerun()
         except Exception as e: